@@ -1,90 +1,232 @@
 # app.py
-import os, sqlite3
+import os, json, hashlib, math, time, threading
+import importlib.util
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 
 from flask import (
-    Flask, render_template, request, redirect, url_for,
-    send_file, jsonify, abort
+    Flask, Blueprint, render_template, request, redirect, url_for, current_app,
+    send_file, jsonify, abort, Response, stream_with_context,
+    g, has_app_context, has_request_context, before_render_template, template_rendered
 )
-from functools import wraps
+from werkzeug.local import LocalProxy
+from functools import partial, wraps
 from dotenv import load_dotenv
 
 # --- project modules ---
-from modules.scoring.pipeline import ScoringEngine  # your engine
+# Only light modules are imported here. The engine (numpy/pandas/scipy),
+# ranking, genotype parsing and the reportlab PDF code are imported where
+# they're first needed, so `import app` stays cheap (see `cli.py importtime`).
+from modules.scoring.encode import negotiate, encode, maybe_gzip, accepted_formats
+from modules.scoring.export import EXPORT_FORMATS, iter_export
+from modules.db.clinic import ClinicDB
+from modules.metrics import (
+    REQUEST_SECONDS, start_trace, end_trace, observe_stage, render_prometheus, server_timing, timed
+)
+from modules.jobs.queue import JobQueue
 # The IO helpers are optional: if you've created modules/scoring/io.py (Part C), these will work.
-try:
-    from modules.scoring.io import save_engine_state, load_engine_state
-    _HAS_IO = True
-except Exception:
-    _HAS_IO = False
+_HAS_IO = importlib.util.find_spec("modules.scoring.io") is not None
 
 # ----------------------------
 # Paths & basic setup
 # ----------------------------
-BASE_DIR   = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR   = os.path.join(BASE_DIR, "data")
-DB_PATH    = os.path.join(DATA_DIR, "demo.db")
-CSV_PATH   = os.path.join(DATA_DIR, "embryos.csv")
-REPORTS_DIR= os.path.join(BASE_DIR, "reports")
-STATE_PATH = os.path.join(DATA_DIR, "weights.pkl")
-
 load_dotenv()
-app = Flask(__name__)
-app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _configure_paths(config) -> None:
+    """
+    Fill in the app's file locations. Keys passed to create_app() win; then
+    DATA_DIR / CSV_PATH / REPORTS_DIR / CSV_CHUNK_ROWS from the environment
+    (benchmarks, scratch copies); everything else lives under DATA_DIR.
+    """
+    config.setdefault("DATA_DIR", os.getenv("DATA_DIR") or os.path.join(BASE_DIR, "data"))
+    data_dir = config["DATA_DIR"]
+    config.setdefault("CSV_PATH", os.getenv("CSV_PATH") or os.path.join(data_dir, "embryos.csv"))
+    config.setdefault("REPORTS_DIR", os.getenv("REPORTS_DIR") or os.path.join(BASE_DIR, "reports"))
+    config.setdefault("DB_PATH", os.path.join(data_dir, "demo.db"))
+    config.setdefault("JOBS_DIR", os.path.join(data_dir, "jobs"))  # file results of background jobs
+    config.setdefault("STATE_PATH", os.path.join(data_dir, "weights.bin"))
+    # pickle format, migrated on startup
+    config.setdefault("LEGACY_STATE_PATH", os.path.join(data_dir, "weights.pkl"))
+    config.setdefault("COHORT_CACHE_DIR", os.path.join(data_dir, ".cohort_cache"))  # mmap-able CSV copy
+    # parse the CSV in chunks of this many rows (0 = at once)
+    config.setdefault("CSV_CHUNK_ROWS", int(os.getenv("CSV_CHUNK_ROWS", "50000")))
+
+# Routes live on a blueprint; create_app() (bottom of the file) builds the app.
+bp = Blueprint("main", __name__)
 
 # Accept either DEMO_API_TOKEN (your existing var) or API_TOKEN
 API_TOKEN = os.getenv("DEMO_API_TOKEN") or os.getenv("API_TOKEN") or "demo123"
 
+# ----------------------------
+# Request timing / metrics
+# ----------------------------
+# Per-request and per-stage (scoring, SQLite, PDF, templates) timings go to
+# in-process histograms served at /metrics. SERVER_TIMING=1 also returns
+# them per response in a Server-Timing header (visible in browser devtools).
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+@bp.before_app_request
+def _start_request_timer():
+    g.metrics_t0 = time.perf_counter()
+    g.metrics_trace = start_trace()
+
+@bp.after_app_request
+def _record_request_timing(resp):
+    token = g.pop("metrics_trace", None)
+    if token is None:
+        return resp
+    elapsed = time.perf_counter() - g.metrics_t0
+    spans = end_trace(token)
+    # streamed bodies are timed up to the headers
+    rule = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.observe(elapsed, request.method, rule, str(resp.status_code))
+    if SERVER_TIMING:
+        resp.headers["Server-Timing"] = server_timing(spans, total=elapsed)
+    return resp
+
+@bp.teardown_app_request
+def _drop_request_trace(exc):
+    token = g.pop("metrics_trace", None)
+    if token is not None:  # after_request didn't run (unhandled error)
+        end_trace(token)
+
+def _template_started(sender, template, context, **extra):
+    g.metrics_template_t0 = time.perf_counter()
+
+def _template_done(sender, template, context, **extra):
+    t0 = g.pop("metrics_template_t0", None)
+    if t0 is not None:
+        observe_stage("template", time.perf_counter() - t0)
+
+@bp.get("/metrics")
+def metrics():
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+# ----------------------------
+# Lazily built services
+# ----------------------------
+# Each app has its own clinic DB, job queue and engine (in
+# app.extensions), built the first time something uses them (a request, a
+# job, or warm-up in the pre-fork master), not at import. `db`, `jobs` and
+# `engines` are proxies to the services of current_app - or, outside an app
+# context (server hooks, benchmarks), of the module's default `app`.
+class _Services:
+    def __init__(self, flask_app: Flask):
+        self.app = flask_app
+        self.config = flask_app.config
+        self.built = {}
+        self.watcher = None  # this app's CohortWatcher, once started
+        self._lock = threading.RLock()
+
+    def get(self, name, build):
+        svc = self.built.get(name)
+        if svc is None:
+            with self._lock:
+                svc = self.built.get(name)
+                if svc is None:
+                    svc = self.built[name] = build(self)
+        return svc
+
+def _app_services(flask_app: Optional[Flask] = None) -> _Services:
+    if flask_app is None:
+        flask_app = current_app._get_current_object() if has_app_context() else app
+    return flask_app.extensions["embryo_services"]
+
+def _service(name, build, flask_app=None):
+    return _app_services(flask_app).get(name, build)
+
 # ----------------------------
 # DB helpers
 # ----------------------------
-def get_db_conn():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    os.makedirs(DATA_DIR, exist_ok=True)
-    conn = get_db_conn(); cur = conn.cursor()
-    cur.execute("""CREATE TABLE IF NOT EXISTS notes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        embryo_id TEXT NOT NULL,
-        content TEXT NOT NULL,
-        created_at TEXT NOT NULL
-    )""")
-    cur.execute("""CREATE TABLE IF NOT EXISTS appointments (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        embryo_id TEXT NOT NULL,
-        name TEXT NOT NULL,
-        email TEXT NOT NULL,
-        appt_time TEXT NOT NULL,
-        notes TEXT
-    )""")
-    conn.commit(); conn.close()
-
-init_db()
+# One pooled connection per thread, WAL mode, indexed by embryo_id
+def _build_db(services):
+    path = services.config["DB_PATH"]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    clinic = ClinicDB(path)
+    clinic.init()
+    return clinic
+
+db = LocalProxy(lambda: _service("db", _build_db))
+
+def init_db(flask_app: Optional[Flask] = None):
+    """Create the clinic and jobs tables now instead of on first use."""
+    _service("db", _build_db, flask_app)
+    _service("jobs", _build_jobs, flask_app)
 
 # ----------------------------
 # Scoring engine
 # ----------------------------
-# Your existing constructor that reads the CSV internally
-engine = ScoringEngine(CSV_PATH)
-
-# If you added persistence (Part C) and a prior state exists, load it:
-if _HAS_IO and Path(STATE_PATH).exists():
-    try:
-        state = load_engine_state(STATE_PATH)
-        # Expect keys: condition_weights, monogenic_penalties, config
-        if "condition_weights" in state:
-            engine.condition_weights = state["condition_weights"]
-        if "monogenic_penalties" in state:
-            engine.monogenic_penalties = state["monogenic_penalties"]
-        if "config" in state and hasattr(engine, "update_config"):
-            engine.update_config(**state["config"])
-        print(f"[engine] loaded state from {STATE_PATH}")
-    except Exception as e:
-        print(f"[engine] warning: could not load state: {e}")
+# The serving engine lives in a holder so the CSV watcher can swap in a
+# rebuilt one. `engine` resolves to holder.current once per request (kept on
+# g), so a request sees one consistent cohort even if a swap lands mid-way.
+def build_engine(flask_app: Optional[Flask] = None):
+    """Load the app's cohort and apply its saved model state, if there is one."""
+    from modules.scoring.pipeline import ScoringEngine
+    cfg = _app_services(flask_app).config
+    state_path, legacy_path = cfg["STATE_PATH"], cfg["LEGACY_STATE_PATH"]
+    eng = ScoringEngine(cfg["CSV_PATH"], cohort_cache_dir=cfg["COHORT_CACHE_DIR"],
+                        chunksize=cfg["CSV_CHUNK_ROWS"] or None)
+    # If you added persistence (Part C) and a prior state exists, load it:
+    if _HAS_IO:
+        try:
+            from modules.scoring.io import apply_engine_state, load_engine_state, migrate_legacy_state
+            if migrate_legacy_state(legacy_path, state_path):
+                print(f"[engine] migrated {legacy_path} -> {state_path}")
+            if Path(state_path).exists():
+                # weights stay memory-mapped; verifying the checksum reads the
+                # file once in 1 MiB chunks without copying it into the heap
+                apply_engine_state(eng, load_engine_state(state_path))
+                print(f"[engine] loaded state from {state_path}")
+        except Exception as e:
+            print(f"[engine] warning: could not load state: {e}")
+    return eng
+
+def _build_engines(services):
+    from modules.scoring.reload import EngineHolder
+    # the engine itself is built on the first holder.current, so swapping one
+    # in first (benchmarks, tests) never loads the default cohort
+    holder = EngineHolder(factory=partial(build_engine, services.app))
+    if not PREFORK:
+        _start_watcher(services, holder)
+    return holder
+
+engines = LocalProxy(lambda: _service("engines", _build_engines))
+
+def _current_engine():
+    if not has_request_context():
+        return engines.current
+    if "engine" not in g:
+        g.engine = engines.current
+    return g.engine
+
+engine = LocalProxy(_current_engine)
+
+# Hot reload: poll the CSV every CSV_WATCH_INTERVAL seconds (0 = off).
+# Appended rows are ingested on their own; other edits reload the file.
+# Under the pre-fork server (cli.py serve, PREFORK=1) threads don't survive
+# fork, so each worker starts its own watcher from the post_fork hook; the
+# master catches up with the CSV before each fork (before_fork).
+PREFORK = os.getenv("PREFORK", "0") == "1"
+
+def _start_watcher(services, holder, start=True):
+    from modules.scoring.reload import CohortWatcher, watch_interval
+    cfg = services.config
+    with services._lock:
+        if services.watcher is None and watch_interval() > 0:
+            services.watcher = CohortWatcher(holder, cfg["CSV_PATH"], interval=watch_interval(),
+                                             cohort_cache_dir=cfg["COHORT_CACHE_DIR"],
+                                             chunksize=cfg["CSV_CHUNK_ROWS"] or None)
+    if start and services.watcher is not None:
+        services.watcher.start()
+    return services.watcher
+
+def start_background(flask_app: Optional[Flask] = None):
+    """Start the app's CSV watcher in this process (idempotent)."""
+    services = _app_services(flask_app)
+    _start_watcher(services, services.get("engines", _build_engines))
 
 # ----------------------------
 # Token helpers
@@ -123,97 +265,339 @@ def _check_token(req):
 # ----------------------------
 # Pages
 # ----------------------------
-@app.route("/")
+DASHBOARD_TOP = int(os.getenv("DASHBOARD_TOP", "100"))
+
+@bp.route("/")
 def dashboard():
-    summaries = sorted(engine.score_all(), key=lambda d: d["overall_score"], reverse=True)
+    top = request.args.get("top", DASHBOARD_TOP, type=int)
+    version = engine.model_version  # one model for both, even if a publish lands between
+    cohort = engine.score_all(version=version)
+    positions, _ = engine.ranking(version).query(limit=top if top > 0 else None)
+    summaries = [cohort[p] for p in positions]
     last_updated = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
     return render_template("dashboard.html", summaries=summaries, last_updated=last_updated)
 
-@app.route("/embryos/<embryo_id>")
+@bp.route("/embryos/<embryo_id>")
 def embryo_detail(embryo_id):
     try:
         detail = engine.compute_detailed_scores(embryo_id)
     except KeyError:
         abort(404)
-    notes = _fetch_notes(embryo_id)
-    appts = _fetch_appointments(embryo_id)
+    notes, appts = db.fetch_activity(embryo_id)
     return render_template("embryo_detail.html", detail=detail, notes=notes, appts=appts)
 
 # ----------------------------
 # DB-backed actions
 # ----------------------------
-def _fetch_notes(embryo_id):
-    conn = get_db_conn(); cur = conn.cursor()
-    cur.execute("SELECT * FROM notes WHERE embryo_id = ? ORDER BY created_at DESC", (embryo_id,))
-    rows = cur.fetchall(); conn.close(); return rows
-
-def _fetch_appointments(embryo_id):
-    conn = get_db_conn(); cur = conn.cursor()
-    cur.execute("SELECT * FROM appointments WHERE embryo_id = ? ORDER BY appt_time DESC", (embryo_id,))
-    rows = cur.fetchall(); conn.close(); return rows
-
-@app.route("/embryos/<embryo_id>/notes", methods=["POST"])
+@bp.route("/embryos/<embryo_id>/notes", methods=["POST"])
 def add_note(embryo_id):
     content = (request.form.get("content") or "").strip()
     if content:
-        conn = get_db_conn(); cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO notes (embryo_id, content, created_at) VALUES (?, ?, ?)",
-            (embryo_id, content, datetime.utcnow().isoformat())
-        )
-        conn.commit(); conn.close()
-    return redirect(url_for("embryo_detail", embryo_id=embryo_id))
-
-@app.route("/embryos/<embryo_id>/appointments", methods=["POST"])
+        db.add_note(embryo_id, content, datetime.utcnow().isoformat())
+    return redirect(url_for("main.embryo_detail", embryo_id=embryo_id))
+
+@bp.route("/embryos/<embryo_id>/appointments", methods=["POST"])
 def schedule_appt(embryo_id):
     name = (request.form.get("name") or "").strip()
     email = (request.form.get("email") or "").strip()
     appt_time = (request.form.get("appt_time") or "").strip()
     notes = (request.form.get("notes") or "").strip() or None
     if name and email and appt_time:
-        conn = get_db_conn(); cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO appointments (embryo_id, name, email, appt_time, notes) VALUES (?, ?, ?, ?, ?)",
-            (embryo_id, name, email, appt_time, notes)
-        )
-        conn.commit(); conn.close()
-    return redirect(url_for("embryo_detail", embryo_id=embryo_id))
+        db.add_appointment(embryo_id, name, email, appt_time, notes)
+    return redirect(url_for("main.embryo_detail", embryo_id=embryo_id))
 
 # ----------------------------
 # Reporting
 # ----------------------------
-from modules.reports.pdf import generate_report_pdf
+# reportlab is imported with modules.reports.* on the first report request
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "0")) or None  # None -> cpu count
 
-@app.route("/report/<embryo_id>.pdf")
+@bp.route("/report/<embryo_id>.pdf")
 def report_pdf(embryo_id):
     try:
         detail = engine.compute_detailed_scores(embryo_id)
     except KeyError:
         abort(404)
-    path = generate_report_pdf(REPORTS_DIR, embryo_id, detail)
+    from modules.reports.pdf import get_report_pdf
+    # content-addressed: re-rendered only when the scores or model change
+    path = get_report_pdf(current_app.config["REPORTS_DIR"], embryo_id, detail, engine.model_version)
     return send_file(path, as_attachment=True, download_name=f"embryo_{embryo_id}_report.pdf")
 
+@bp.route("/api/reports/batch", methods=["GET", "POST"])
+@require_token
+def report_batch():
+    """ZIP of reports for the given IDs (?ids=A,B or JSON {"embryo_ids": [...]}); all if omitted."""
+    from modules.reports.batch import render_reports, iter_zip
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "expected a JSON object"}), 400
+    ids = data.get("embryo_ids")
+    if ids is not None and not (isinstance(ids, list) and all(isinstance(i, str) for i in ids)):
+        return jsonify({"error": "embryo_ids must be a list of strings"}), 400
+    if ids is None and request.args.get("ids"):
+        ids = [i for i in request.args["ids"].split(",") if i]
+    try:
+        details = engine.score_all() if ids is None else [engine.compute_detailed_scores(str(i)) for i in ids]
+    except KeyError as e:
+        return jsonify({"error": f"unknown embryo id {e.args[0]}"}), 404
+    files = ((f"embryo_{eid}_report.pdf", path)
+             for eid, path in render_reports(current_app.config["REPORTS_DIR"], details,
+                                             engine.model_version, REPORT_WORKERS))
+    return Response(stream_with_context(iter_zip(files)), mimetype="application/zip",
+                    headers={"Content-Disposition": "attachment; filename=embryo_reports.zip"})
+
 # ----------------------------
 # JSON API (existing)
 # ----------------------------
-@app.route("/api/embryos")
+_RANK_PARAMS = {"limit", "offset", "cursor", "sort", "order", "filter", "carrier", "top"}
+MAX_PAGE = 1000
+
+def _wants_ranking(args) -> bool:
+    return any(k in _RANK_PARAMS or k.endswith(("<", ">", "!")) or "<" in k or ">" in k for k in args)
+
+def _pinned_version():
+    """
+    (model version for this request, None) or (None, error response).
+    ?version=N (or an X-Model-Version header) pins a recent model version;
+    410 if it has dropped out of the engine's history.
+    """
+    raw = request.args.get("version") or request.headers.get("X-Model-Version")
+    if not raw:
+        return engine.model_version, None
+    try:
+        version = int(raw)
+        engine.snapshot(version)
+    except ValueError:
+        return None, (jsonify({"error": "version must be an integer"}), 400)
+    except KeyError:
+        return None, (jsonify({"error": f"model version {raw} is no longer available",
+                               "available": engine.versions}), 410)
+    return version, None
+
+def _ranked_page(args, version):
+    """(payload, None) for one page of the ranked cohort, or (None, error response)."""
+    from modules.scoring.ranking import parse_query_filters, encode_cursor, decode_cursor
+    sort = args.get("sort", "overall_score")
+    descending = args.get("order", "desc").lower() != "asc"
+    carrier = args.get("carrier")
+    if carrier is not None:
+        carrier = carrier.lower() in ("1", "true", "yes")
+    try:
+        filters = parse_query_filters(args)
+        key = "top" if args.get("top", type=int) is not None else "limit"
+        limit = args.get(key, MAX_PAGE, type=int)
+        if limit < 1:
+            raise ValueError(f"{key} must be at least 1")
+        limit = min(limit, MAX_PAGE)
+        offset = max(0, args.get("offset", 0, type=int))
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+
+    # the cursor pins the query and the model version it was issued for
+    query_key = json.dumps([sort, descending, sorted(filters), carrier, limit])
+    if args.get("cursor"):
+        try:
+            cur = decode_cursor(args["cursor"])
+        except ValueError as e:
+            return None, (jsonify({"error": str(e)}), 400)
+        if cur["q"] != query_key:
+            return None, (jsonify({"error": "cursor does not match this query"}), 400)
+        if cur["v"] != version:
+            # keep paging the version the cursor started on while it's retained
+            if cur["v"] not in engine.versions:
+                return None, (jsonify({"error": "scores changed since this cursor was issued; "
+                                                "restart from offset 0", "model_version": version}), 409)
+            version = cur["v"]
+        offset = cur["o"]
+
+    cohort = engine.score_all(version=version)
+    try:
+        positions, total = engine.ranking(version).query(sort=sort, descending=descending, filters=filters,
+                                                  carrier=carrier, offset=offset, limit=limit)
+    except KeyError as e:
+        return None, (jsonify({"error": f"unknown field {e.args[0]!r}"}), 400)
+    end = offset + len(positions)
+    next_cursor = encode_cursor(version, end, query_key) if end < total and "top" not in args else None
+    return {
+        "items": [cohort[p] for p in positions],
+        "total": total, "offset": offset, "limit": limit,
+        "next_cursor": next_cursor, "model_version": version,
+    }, None
+
+# encoded list responses by ETag, so repeat requests skip serialization too
+_ENCODED = OrderedDict()
+_ENCODED_MAX = 16
+_ENCODED_LOCK = threading.Lock()
+
+def _send_encoded(etag, body, mimetype, gzipped):
+    resp = Response(body, mimetype=mimetype)
+    if gzipped:
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.headers["Vary"] = "Accept, Accept-Encoding"
+    resp.headers["Cache-Control"] = "private, no-cache"  # always revalidate via ETag
+    if etag:
+        resp.set_etag(etag)
+    return resp
+
+@bp.route("/api/embryos")
 def api_list():
+    """
+    Whole cohort as a plain list, or - with any of limit/offset/cursor/sort/
+    order/filter/carrier/top, or a bare filter like ?HeartDisease<20 - one
+    page of the ranked cohort:
+      {"items", "total", "offset", "limit", "next_cursor", "model_version"}
+
+    Format is picked by ?format=json|columnar|msgpack or the Accept header
+    (406 if unavailable); large bodies are gzipped if the client accepts it.
+    The ETag covers the model's content fingerprint and version, format,
+    encoding and query, and a matching If-None-Match gets 304 without
+    rescoring or reserializing.
+    ?version=N serves a recent earlier model version (410 once it's gone).
+    """
     if not _check_token(request): return jsonify({"error":"unauthorized"}), 401
-    return jsonify(engine.score_all())
-
-@app.route("/api/embryos/<embryo_id>")
+    args = request.args
+    fmt = negotiate(args.get("format"), request.accept_mimetypes)
+    if fmt is None:
+        return jsonify({"error": "not acceptable", "formats": accepted_formats()}), 406
+
+    version, error = _pinned_version()
+    if error is not None:
+        return error
+    gz = "gzip" in request.accept_encodings
+    query = sorted((k, v) for k, v in args.items(multi=True) if k not in ("token", "format"))
+    # model_version restarts from 1 in every process, so the content
+    # fingerprint is what ties the tag to the data actually served
+    etag = hashlib.sha1(json.dumps([engine.fingerprint(version), version, fmt, gz, query]).encode()).hexdigest()
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        return resp
+    with _ENCODED_LOCK:
+        hit = _ENCODED.get(etag)
+        if hit is not None:
+            _ENCODED.move_to_end(etag)
+    if hit is not None:
+        return _send_encoded(etag, *hit)
+
+    if _wants_ranking(args):
+        payload, error = _ranked_page(args, version)
+        if error is not None:
+            return error
+    else:
+        payload = engine.score_all(version=version)
+    body, mimetype = encode(payload, fmt)
+    body, gzipped = maybe_gzip(body, request.accept_encodings)
+
+    with _ENCODED_LOCK:
+        _ENCODED[etag] = (body, mimetype, gzipped)
+        while len(_ENCODED) > _ENCODED_MAX:
+            _ENCODED.popitem(last=False)
+    return _send_encoded(etag, body, mimetype, gzipped)
+
+@bp.route("/api/embryos/export")
+def api_export():
+    """
+    Stream every embryo's scores as NDJSON (default) or CSV (?format=csv).
+    Rows are scored block by block and flushed in chunks, so memory stays
+    flat however large the cohort is.
+    """
+    if not _check_token(request): return jsonify({"error":"unauthorized"}), 401
+    fmt = request.args.get("format", "ndjson").lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {sorted(EXPORT_FORMATS)}"}), 400
+    version, error = _pinned_version()
+    if error is not None:
+        return error
+    conditions = list(engine.snapshot(version).condition_names)
+    body = iter_export(engine.iter_scores(version=version), fmt, conditions)
+    return Response(stream_with_context(body), mimetype=EXPORT_FORMATS[fmt], headers={
+        "Content-Disposition": f"attachment; filename=embryo_scores.{fmt}",
+        "X-Model-Version": str(version),
+    })
+
+@bp.route("/api/embryos/<embryo_id>")
 def api_detail(embryo_id):
     if not _check_token(request): return jsonify({"error":"unauthorized"}), 401
+    version, error = _pinned_version()
+    if error is not None:
+        return error
     try:
-        detail = engine.compute_detailed_scores(embryo_id)
+        detail = engine.compute_detailed_scores(embryo_id, version=version)
     except KeyError:
         return jsonify({"error":"not found"}), 404
-    return jsonify(detail)
+    resp = jsonify(detail)
+    resp.headers["X-Model-Version"] = str(version)
+    return resp
+
+# Ad-hoc scoring of genotypes that aren't in the cohort
+SCORE_MAX_ROWS = int(os.getenv("SCORE_MAX_ROWS", "100000"))
+SCORE_MAX_BYTES = int(os.getenv("SCORE_MAX_BYTES", str(64 * 1024 * 1024)))
+_UPLOAD_TYPES = {".csv": "text/csv", ".npy": "application/x-npy", ".json": "application/json"}
+
+@bp.post("/api/score")
+@require_token
+def score_genotypes():
+    """
+    Score a batch of genotype rows without adding them to the cohort.
+
+    Body: JSON ({"rows": [...]} or {"snp_cols", "dosages", "ids", "monogenic"}),
+    a CSV like the cohort file, or an .npy (embryos × SNPs) matrix in
+    snp_cols order - raw or as a multipart "file" upload (with an optional
+    "ids" form field for .npy). Columns are checked against the engine's
+    snp_cols. Results stream back as ?format=json (default), ndjson or csv.
+    Limits: SCORE_MAX_BYTES per body (413), SCORE_MAX_ROWS rows (413).
+    """
+    from modules.scoring.genotypes import BatchTooLarge, GenotypeError, parse_genotypes
+    fmt = request.args.get("format", "json").lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {sorted(EXPORT_FORMATS)}"}), 400
+    if request.content_length is not None and request.content_length > SCORE_MAX_BYTES:
+        return jsonify({"error": f"body larger than {SCORE_MAX_BYTES} bytes"}), 413
+    version, error = _pinned_version()
+    if error is not None:
+        return error
+
+    ids, payload = None, None
+    upload = request.files.get("file")
+    if upload is not None:
+        body = upload.read(SCORE_MAX_BYTES + 1)
+        ctype = _UPLOAD_TYPES.get(Path(upload.filename or "").suffix.lower(), upload.mimetype)
+        if request.form.get("ids"):
+            ids = [i.strip() for i in request.form["ids"].replace("\n", ",").split(",") if i.strip()]
+    else:
+        body = request.stream.read(SCORE_MAX_BYTES + 1)
+        ctype = request.mimetype
+    if len(body) > SCORE_MAX_BYTES:
+        return jsonify({"error": f"body larger than {SCORE_MAX_BYTES} bytes"}), 413
+    if ctype == "application/json":
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            return jsonify({"error": f"invalid JSON: {e}"}), 400
+
+    model = engine.snapshot(version)
+    snp_cols = model.store.snp_cols
+    try:
+        with timed("score_parse"):
+            store = parse_genotypes(body, ctype, snp_cols, json_payload=payload,
+                                    max_rows=SCORE_MAX_ROWS, ids=ids)
+    except GenotypeError as e:
+        status = 413 if isinstance(e, BatchTooLarge) else 400
+        return jsonify({"error": str(e), "snp_cols": len(snp_cols)}), status
+
+    conditions = list(model.condition_names)
+    body = iter_export(engine.score_batch(store, version=version), fmt, conditions)
+    return Response(stream_with_context(body), mimetype=EXPORT_FORMATS[fmt], headers={
+        "X-Model-Version": str(version),
+        "X-Embryo-Count": str(len(store)),
+    })
 
 # ----------------------------
 # NEW: Config & Model state endpoints
 # ----------------------------
-@app.get("/api/config")
+@bp.get("/api/config")
 @require_token
 def get_config():
     # Requires engine to expose .config with .seed / .scale
@@ -223,20 +607,27 @@ def get_config():
         return jsonify({"error": "config not supported by engine"}), 501
     return jsonify({"seed": getattr(cfg, "seed", None), "scale": getattr(cfg, "scale", None)})
 
-@app.post("/api/config")
-@require_token
-def set_config():
-    data = request.get_json(force=True, silent=True) or {}
+def _config_params(data):
+    """(seed, scale, None) checked from a config body, or (None, None, error message)."""
     seed  = data.get("seed")
     scale = data.get("scale")
-
-    # Validate
     if seed is not None:
         try: seed = int(seed)
-        except Exception: return jsonify({"error": "seed must be int"}), 400
+        except Exception: return None, None, "seed must be int"
     if scale is not None:
         try: scale = float(scale)
-        except Exception: return jsonify({"error": "scale must be float"}), 400
+        except Exception: return None, None, "scale must be float"
+        if not math.isfinite(scale) or scale <= 0:
+            return None, None, "scale must be a finite number > 0"
+    return seed, scale, None
+
+@bp.post("/api/config")
+@require_token
+def set_config():
+    data = request.get_json(force=True, silent=True) or {}
+    seed, scale, error = _config_params(data)
+    if error is not None:
+        return jsonify({"error": error}), 400
 
     if not hasattr(engine, "update_config"):
         return jsonify({"error": "engine cannot update config"}), 501
@@ -245,54 +636,216 @@ def set_config():
     cfg = engine.config
     return jsonify({"ok": True, "config": {"seed": cfg.seed, "scale": cfg.scale}})
 
-@app.post("/api/model/save")
+@bp.post("/api/model/save")
 @require_token
 def save_model():
     if not _HAS_IO:
         return jsonify({"ok": False, "error": "IO helpers not available"}), 501
+    from modules.scoring.io import save_engine_state
+    path = current_app.config["STATE_PATH"]
     try:
-        save_engine_state(engine, STATE_PATH)
-        return jsonify({"ok": True, "path": STATE_PATH})
+        save_engine_state(engine, path)
+        return jsonify({"ok": True, "path": path})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
-@app.post("/api/model/load")
+@bp.post("/api/model/load")
 @require_token
 def load_model():
     if not _HAS_IO:
         return jsonify({"ok": False, "error": "IO helpers not available"}), 501
+    from modules.scoring.io import apply_engine_state, load_engine_state
     try:
-        state = load_engine_state(STATE_PATH)
-        if "condition_weights" in state:
-            engine.condition_weights = state["condition_weights"]
-        if "monogenic_penalties" in state:
-            engine.monogenic_penalties = state["monogenic_penalties"]
-        if "config" in state and hasattr(engine, "update_config"):
-            engine.update_config(**state["config"])
+        state = load_engine_state(current_app.config["STATE_PATH"])
+        apply_engine_state(engine, state)
         return jsonify({"ok": True, "config": state.get("config", {})})
     except FileNotFoundError:
         return jsonify({"ok": False, "error": "no saved state"}), 404
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
+# ----------------------------
+# Background jobs
+# ----------------------------
+# Heavy work (full-cohort scoring, report batches, reweighting) can run off
+# the request thread: POST /api/jobs, then poll GET /api/jobs/<id>.
+def _build_jobs(services):
+    cfg = services.config
+    os.makedirs(os.path.dirname(cfg["DB_PATH"]) or ".", exist_ok=True)
+    queue = JobQueue(cfg["DB_PATH"], cfg["JOBS_DIR"], max_workers=int(os.getenv("JOB_WORKERS", "2")))
+    queue.init()
+    # handlers get the services of the app that owns the queue
+    queue.register("score_cohort", partial(_job_score_cohort, services))
+    queue.register("render_reports", partial(_job_render_reports, services))
+    queue.register("reweight", partial(_job_reweight, services))
+    return queue
+
+jobs = LocalProxy(lambda: _service("jobs", _build_jobs))
+
+def _job_engine(services):
+    return services.get("engines", _build_engines).current
+
+# Jobs run outside a request: each one pins the engine it started with.
+def _job_score_cohort(services, ctx, params):
+    engine = _job_engine(services)
+    total = max(1, len(engine.store))
+    path = ctx.result_path(".json")
+    with open(path, "w") as f:
+        f.write("[")
+        for i, detail in enumerate(engine.iter_scores()):
+            f.write(("," if i else "") + json.dumps(detail))
+            if i % 1024 == 0:
+                ctx.progress(i / total)
+        f.write("]")
+    return {"path": path}
+
+def _job_render_reports(services, ctx, params):
+    from modules.reports.batch import render_reports, iter_zip
+    engine = _job_engine(services)
+    ids = params.get("embryo_ids")
+    details = engine.score_all() if ids is None else [engine.compute_detailed_scores(str(i)) for i in ids]
+    path = ctx.result_path(".zip")
+    rendered = render_reports(services.config["REPORTS_DIR"], details, engine.model_version, REPORT_WORKERS)
+
+    def files():
+        for i, (eid, pdf) in enumerate(rendered, 1):
+            ctx.progress(i / max(1, len(details)))
+            yield f"embryo_{eid}_report.pdf", pdf
+
+    with open(path, "wb") as f:
+        for chunk in iter_zip(files()):
+            f.write(chunk)
+    return {"path": path}
+
+def _job_reweight(services, ctx, params):
+    engine = _job_engine(services)
+    engine.update_config(seed=params.get("seed"), scale=params.get("scale"))  # checked on submit
+    ctx.progress(0.5)
+    engine.score_all()  # warm the cohort cache so reads after the job are instant
+    return {"config": {"seed": engine.config.seed, "scale": engine.config.scale}}
+
+def before_fork(flask_app: Optional[Flask] = None):
+    """
+    Bring the app's engine up to date with the CSV, so a worker forked now
+    (or recycled later) starts from the current cohort, and close this
+    process's SQLite connections so forked workers open their own.
+    """
+    services = _app_services(flask_app)
+    built = services.built
+    if "engines" in built:
+        watcher = _start_watcher(services, built["engines"], start=False)
+        if watcher is not None:
+            try:
+                watcher.check()
+            except Exception as e:  # fork anyway; the worker's watcher retries
+                print(f"[cohort-watcher] reload failed: {e}")
+    if "db" in built:
+        built["db"].close()
+    if "jobs" in built:
+        built["jobs"].pool.close()
+
+@bp.post("/api/jobs")
+@require_token
+def submit_job():
+    data = request.get_json(force=True, silent=True) or {}
+    kind = data.get("kind")
+    params = data.get("params") or {}
+    if not isinstance(params, dict):
+        return jsonify({"error": "params must be an object"}), 400
+    # check params now: a bad value should be a 400, not a failed job later
+    if kind == "reweight":
+        seed, scale, error = _config_params(params)
+        if error is not None:
+            return jsonify({"error": error}), 400
+        params = {"seed": seed, "scale": scale}
+    elif kind == "render_reports":
+        ids = params.get("embryo_ids")
+        if ids is not None and not (isinstance(ids, list) and all(isinstance(i, str) for i in ids)):
+            return jsonify({"error": "embryo_ids must be a list of strings"}), 400
+    try:
+        job_id = jobs.submit(kind, params)
+    except KeyError:
+        return jsonify({"error": f"unknown job kind {kind!r}", "kinds": jobs.kinds}), 400
+    return jsonify({"id": job_id, "status": "queued",
+                    "url": url_for("main.job_status", job_id=job_id)}), 202
+
+@bp.get("/api/jobs/<job_id>")
+@require_token
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "not found"}), 404
+    if job["has_file"] and job["status"] == "done":
+        job["result_url"] = url_for("main.job_result", job_id=job_id)
+    return jsonify(job)
+
+@bp.get("/api/jobs/<job_id>/result")
+@require_token
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "not found"}), 404
+    if job["status"] != "done":
+        return jsonify({"error": f"job is {job['status']}", "status": job["status"]}), 409
+    path = jobs.result_file(job_id)
+    if path is None:
+        return jsonify(job["result"])
+    return send_file(path, as_attachment=True, download_name=f"{job['kind']}_{job_id}{Path(path).suffix}")
+
 # ----------------------------
 # Debug helper (optional)
 # ----------------------------
-@app.get("/_debug/routes")
+@bp.get("/_debug/routes")
 def _routes():
-    return jsonify(sorted([str(r) for r in app.url_map.iter_rules()]))
-
-@app.get("/settings")
+    return jsonify(sorted([str(r) for r in current_app.url_map.iter_rules()]))
+
+@bp.get("/_debug/cache")
+def _cache_stats():
+    # score cache hit/miss/eviction counters + current model version
+    stats = engine.cache_stats()
+    stats["embryos"] = len(engine.store)
+    stats["engine_generation"] = engines.generation
+    watcher = _app_services().watcher
+    if watcher is not None:
+        stats["reloads"] = dict(watcher.reloads)
+    return jsonify(stats)
+
+@bp.get("/settings")
 def settings():
     # passes the API token so the page JS can call the protected endpoints
     return render_template("settings.html", api_token=API_TOKEN)
 
-@app.get("/compare")
+@bp.get("/compare")
 def compare():
     # pass the token so the React app can call protected APIs
     return render_template("compare.html", api_token=API_TOKEN)
 
 
+# ----------------------------
+# App factory
+# ----------------------------
+def create_app(config: Optional[dict] = None) -> Flask:
+    """
+    Build the Flask app. Cheap by design: no data is loaded and no DB is
+    touched until a request (or warm-up) needs it.
+
+    `config` may set DATA_DIR, CSV_PATH, REPORTS_DIR, DB_PATH and the other
+    paths filled in by _configure_paths(); the app gets its own clinic DB,
+    job queue and engine over them.
+    """
+    flask_app = Flask(__name__)
+    flask_app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret")
+    flask_app.config.update(config or {})
+    _configure_paths(flask_app.config)
+    flask_app.extensions["embryo_services"] = _Services(flask_app)
+    flask_app.register_blueprint(bp)
+    before_render_template.connect(_template_started, flask_app)
+    template_rendered.connect(_template_done, flask_app)
+    return flask_app
+
+# for `python app.py`, `gunicorn app:app` and scripts that import app.app
+app = create_app()
+
 # ----------------------------
 # Main
 # ----------------------------
@@ -0,0 +1,237 @@
+# cli.py
+"""
+Command-line tools for the scoring engine.
+
+  python cli.py score [--csv data/embryos.csv] [--workers 8] [--out scores.json]
+  python cli.py export [--format ndjson|csv] [--source big.csv] [--out scores.ndjson]
+  python cli.py serve [--bind 0.0.0.0:8000] [--workers 4] [--threads 4] [--max-requests 5000]
+  python cli.py importtime [--module app] [--request /] [--top 15]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+
+def _build_engine(args):
+    from modules.scoring.pipeline import ScoringEngine
+    from modules.scoring.io import apply_engine_state, load_engine_state
+
+    t0 = time.perf_counter()
+    engine = ScoringEngine(args.csv, cohort_cache_dir=args.cohort_cache or None,
+                           chunksize=args.chunk_rows or None, workers=args.workers)
+    if args.weights and os.path.exists(args.weights):
+        apply_engine_state(engine, load_engine_state(args.weights))
+    layout = "csr" if engine.store.sparse else "dense"
+    print(f"[cli] loaded {len(engine.store)} embryos x {len(engine.snp_cols)} SNPs "
+          f"({layout} dosages) in {time.perf_counter() - t0:.3f}s", file=sys.stderr)
+    return engine
+
+
+def cmd_score(args) -> int:
+    engine = _build_engine(args)
+    t0 = time.perf_counter()
+    results = engine.score_all(workers=args.workers)
+    print(f"[cli] scored {len(results)} embryos with {args.workers} worker(s) "
+          f"in {time.perf_counter() - t0:.3f}s", file=sys.stderr)
+    out = open(args.out, "w") if args.out != "-" else sys.stdout
+    try:
+        json.dump(results, out)
+        out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def cmd_export(args) -> int:
+    from modules.scoring.export import iter_export
+
+    engine = _build_engine(args)
+    t0 = time.perf_counter()
+    n = 0
+
+    def counted(details):
+        nonlocal n
+        for d in details:
+            n += 1
+            yield d
+
+    # --source scores another CSV with this model without loading it whole
+    details = counted(engine.iter_scores(args.source or None))
+    out = open(args.out, "wb") if args.out != "-" else sys.stdout.buffer
+    try:
+        for chunk in iter_export(details, args.format, engine.condition_names):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+        else:
+            out.flush()
+    print(f"[cli] exported {n} embryos as {args.format} in {time.perf_counter() - t0:.3f}s",
+          file=sys.stderr)
+    return 0
+
+
+def cmd_serve(args) -> int:
+    from modules.server import serve
+
+    if args.watch_interval is not None:
+        os.environ["CSV_WATCH_INTERVAL"] = str(args.watch_interval)
+    jitter = args.max_requests_jitter
+    if jitter is None:
+        jitter = args.max_requests // 10
+    return serve(args.bind, args.workers, threads=args.threads,
+                 max_requests=args.max_requests, max_requests_jitter=jitter,
+                 timeout=args.timeout, graceful_timeout=args.graceful_timeout,
+                 reload=args.reload, score_workers=args.score_workers)
+
+
+# Run in a fresh interpreter under -X importtime: imports `module`, then
+# optionally serves one request through the test client (the cold start).
+_STARTUP_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module} as m
+out = {{"import_s": time.perf_counter() - t0}}
+if {path!r}:
+    sys.stderr.write("{marker}\\n")
+    t1 = time.perf_counter()
+    token = getattr(m, "API_TOKEN", "")
+    r = m.app.test_client().get({path!r}, headers={{"Authorization": "Bearer " + token}})
+    out["request_s"] = time.perf_counter() - t1
+    out["status"] = r.status_code
+print(json.dumps(out))
+"""
+
+
+_REQUEST_MARKER = "-- first request --"
+
+
+def _parse_importtime(stderr: str):
+    """
+    [(module, self_us, cumulative_us, depth, lazy)] from -X importtime
+    output; `lazy` marks imports made while serving the first request.
+    """
+    rows, lazy = [], False
+    for line in stderr.splitlines():
+        if line == _REQUEST_MARKER:
+            lazy = True
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(parts[0]), int(parts[1]), depth, lazy))
+    return rows
+
+
+def cmd_importtime(args) -> int:
+    import subprocess
+
+    env = dict(os.environ, CSV_WATCH_INTERVAL=os.getenv("CSV_WATCH_INTERVAL", "0"))
+    probe = _STARTUP_PROBE.format(module=args.module, path=args.request, marker=_REQUEST_MARKER)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=BASE_DIR,
+                          env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stderr, file=sys.stderr)
+        return proc.returncode
+    rows = _parse_importtime(proc.stderr)
+    timing = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    def summary(lazy):
+        top = [r for r in rows if r[4] == lazy and r[3] == 0]
+        return f"{sum(r[2] for r in top) / 1e3:.1f} ms importing {sum(r[4] == lazy for r in rows)} modules"
+
+    print(f"import {args.module}: {timing['import_s'] * 1e3:.1f} ms ({summary(False)})")
+    if "request_s" in timing:
+        print(f"first GET {args.request}: {timing['request_s'] * 1e3:.1f} ms, status {timing['status']} "
+              f"({summary(True)}; lazy engine/DB/PDF setup lands here)")
+
+    by_pkg = {}
+    for name, self_us, _, _, lazy in rows:
+        key = (name.split(".")[0], lazy)
+        by_pkg[key] = by_pkg.get(key, 0) + self_us
+    tag = lambda lazy: "request" if lazy else "import"
+    print(f"\nby top-level package (self time, top {args.top}):")
+    for (pkg, lazy), us in sorted(by_pkg.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {us / 1e3:9.1f} ms  {tag(lazy):<8} {pkg}")
+    print(f"\nslowest imports (cumulative, top {args.top}):")
+    for name, self_us, cum_us, depth, lazy in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"  {cum_us / 1e3:9.1f} ms  {self_us / 1e3:7.1f} self  {tag(lazy):<8} {'  ' * depth}{name}")
+    return 0
+
+
+def _add_engine_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--csv", default=os.path.join(DATA_DIR, "embryos.csv"), help="cohort CSV")
+    p.add_argument("--weights", default=os.path.join(DATA_DIR, "weights.bin"),
+                   help="saved weight store to apply, if it exists")
+    p.add_argument("--cohort-cache", default=os.path.join(DATA_DIR, ".cohort_cache"),
+                   help="binary cohort cache dir ('' to disable)")
+    p.add_argument("--chunk-rows", type=int, default=int(os.getenv("CSV_CHUNK_ROWS", "50000")),
+                   help="rows parsed per CSV chunk, bounding load memory "
+                        "(0 = whole file at once; default $CSV_CHUNK_ROWS or 50000)")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                   help="scoring processes (default: cpu count)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="cli.py", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("score", help="score the whole cohort and write JSON")
+    _add_engine_args(p)
+    p.add_argument("--out", default="-", help="output file ('-' for stdout)")
+    p.set_defaults(func=cmd_score)
+
+    p = sub.add_parser("export", help="stream per-embryo scores as NDJSON or CSV")
+    _add_engine_args(p)
+    p.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    p.add_argument("--source", default="",
+                   help="score this CSV in chunks instead of the loaded cohort")
+    p.add_argument("--out", default="-", help="output file ('-' for stdout)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("serve", help="pre-fork production server (gunicorn) with a warm engine")
+    p.add_argument("--bind", default=f"0.0.0.0:{os.getenv('PORT', '8000')}")
+    p.add_argument("--workers", type=int,
+                   default=int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1,
+                   help="worker processes (default: $WEB_CONCURRENCY or cpu count)")
+    p.add_argument("--threads", type=int, default=int(os.getenv("WEB_THREADS", "4")),
+                   help="threads per worker (>1 uses the gthread worker)")
+    p.add_argument("--max-requests", type=int, default=int(os.getenv("WEB_MAX_REQUESTS", "0")),
+                   help="recycle a worker after this many requests (0 = never)")
+    p.add_argument("--max-requests-jitter", type=int, default=None,
+                   help="random extra requests per worker so they don't recycle together "
+                        "(default: 10%% of --max-requests)")
+    p.add_argument("--timeout", type=int, default=60, help="seconds before a silent worker is killed")
+    p.add_argument("--graceful-timeout", type=int, default=30,
+                   help="seconds workers get to finish requests on reload/shutdown")
+    p.add_argument("--reload", action="store_true",
+                   help="restart workers on code changes (development; disables preloading)")
+    p.add_argument("--watch-interval", type=float, default=None,
+                   help="CSV hot-reload poll interval per worker (0 = off; default $CSV_WATCH_INTERVAL)")
+    p.add_argument("--score-workers", type=int, default=os.cpu_count() or 1,
+                   help="processes used to pre-score the cohort at startup")
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser("importtime", help="startup-time report (python -X importtime breakdown)")
+    p.add_argument("--module", default="app", help="module to import cold")
+    p.add_argument("--request", default="",
+                   help="also time one GET of this path through module.app (e.g. /)")
+    p.add_argument("--top", type=int, default=15, help="rows per table")
+    p.set_defaults(func=cmd_importtime)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# modules/db/clinic.py
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from modules.db.pool import ConnectionPool
+from modules.metrics import timed
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS notes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        embryo_id TEXT NOT NULL,
+        content TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS appointments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        embryo_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        appt_time TEXT NOT NULL,
+        notes TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_notes_embryo_created ON notes (embryo_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_appts_embryo_time ON appointments (embryo_id, appt_time)",
+)
+
+# Notes and appointments for one embryo in a single statement; both halves
+# are served by the (embryo_id, time) indexes.
+_ACTIVITY_SQL = """
+    SELECT 'note' AS kind, id, embryo_id, content, created_at AS ts,
+           NULL AS name, NULL AS email, NULL AS notes
+      FROM notes WHERE embryo_id = ?
+    UNION ALL
+    SELECT 'appt' AS kind, id, embryo_id, NULL, appt_time,
+           name, email, notes
+      FROM appointments WHERE embryo_id = ?
+    ORDER BY kind, ts DESC
+"""
+
+
+class ClinicDB:
+    """Notes + appointments storage on a per-thread connection pool."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pool = ConnectionPool(path)
+
+    def conn(self):
+        return self.pool.conn()
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def init(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = self.conn()
+        with conn:
+            for stmt in SCHEMA:
+                conn.execute(stmt)
+
+    # ---------- Reads ----------
+    def fetch_activity(self, embryo_id: str) -> Tuple[List[dict], List[dict]]:
+        """(notes newest first, appointments latest first) for one embryo."""
+        notes, appts = [], []
+        with timed("sqlite_fetch_activity"):
+            rows = self.conn().execute(_ACTIVITY_SQL, (embryo_id, embryo_id)).fetchall()
+        for r in rows:
+            if r["kind"] == "note":
+                notes.append({"id": r["id"], "embryo_id": r["embryo_id"],
+                              "content": r["content"], "created_at": r["ts"]})
+            else:
+                appts.append({"id": r["id"], "embryo_id": r["embryo_id"], "name": r["name"],
+                              "email": r["email"], "appt_time": r["ts"], "notes": r["notes"]})
+        return notes, appts
+
+    # ---------- Writes ----------
+    def add_note(self, embryo_id: str, content: str, created_at: Optional[str] = None) -> None:
+        conn = self.conn()
+        with timed("sqlite_add_note"), conn:
+            conn.execute(
+                "INSERT INTO notes (embryo_id, content, created_at) VALUES (?, ?, ?)",
+                (embryo_id, content, created_at or datetime.utcnow().isoformat())
+            )
+
+    def add_appointment(self, embryo_id: str, name: str, email: str,
+                        appt_time: str, notes: Optional[str] = None) -> None:
+        conn = self.conn()
+        with timed("sqlite_add_appointment"), conn:
+            conn.execute(
+                "INSERT INTO appointments (embryo_id, name, email, appt_time, notes) VALUES (?, ?, ?, ?, ?)",
+                (embryo_id, name, email, appt_time, notes)
+            )
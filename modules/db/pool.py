@@ -0,0 +1,43 @@
+# modules/db/pool.py
+import sqlite3
+import threading
+
+# Applied to every new connection. WAL lets readers run alongside a writer;
+# synchronous=NORMAL is safe with WAL and avoids an fsync per commit.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",      # ~16 MB page cache per connection
+    "PRAGMA mmap_size=134217728",    # 128 MB
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class ConnectionPool:
+    """
+    One open connection per thread for a SQLite file (sqlite3 connections
+    can't be shared across threads), so callers don't pay connect/pragma
+    setup on every query.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.row_factory = sqlite3.Row
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        """Close this thread's connection (others close when their thread exits)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
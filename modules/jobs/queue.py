@@ -0,0 +1,180 @@
+# modules/jobs/queue.py
+import json
+import os
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from modules.db.pool import ConnectionPool
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        status TEXT NOT NULL,            -- queued | running | done | failed
+        progress REAL NOT NULL DEFAULT 0,
+        params TEXT,
+        result TEXT,                     -- JSON result (small results)
+        result_path TEXT,                -- file result (large results)
+        error TEXT,
+        created_at TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT,
+        owner TEXT                       -- "<pid>:<token>" of the process running it
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at)",
+)
+
+# Don't write progress more often than this (seconds) per job.
+PROGRESS_INTERVAL = 0.25
+
+
+class JobContext:
+    """Handed to job functions: progress reporting + a place to write files."""
+
+    def __init__(self, queue: "JobQueue", job_id: str):
+        self.queue = queue
+        self.id = job_id
+        self._last = 0.0
+
+    def progress(self, fraction: float) -> None:
+        now = time.monotonic()
+        if now - self._last >= PROGRESS_INTERVAL or fraction >= 1.0:
+            self._last = now
+            self.queue._update(self.id, progress=max(0.0, min(1.0, float(fraction))))
+
+    def result_path(self, suffix: str) -> str:
+        os.makedirs(self.queue.results_dir, exist_ok=True)
+        return os.path.join(self.queue.results_dir, f"{self.id}{suffix}")
+
+
+class JobQueue:
+    """
+    Background jobs on a thread pool, with state kept in a SQLite `jobs`
+    table so status survives the request that started the job.
+
+    A job function is registered per kind and called as fn(ctx, params).
+    It returns either a JSON-able value or {"path": <file>} for file results.
+    """
+
+    def __init__(self, db_path: str, results_dir: str, max_workers: int = 2):
+        self.pool = ConnectionPool(db_path)
+        self.results_dir = results_dir
+        self._handlers: Dict[str, Callable[[JobContext, dict], Any]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+
+    def init(self) -> None:
+        conn = self.pool.conn()
+        with conn:
+            for stmt in SCHEMA:
+                conn.execute(stmt)
+            if "owner" not in {r[1] for r in conn.execute("PRAGMA table_info(jobs)")}:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            # Only jobs whose process is gone can't still be running: other
+            # workers (and their jobs) may share this database.
+            stale = [r["id"] for r in conn.execute(
+                "SELECT id, owner FROM jobs WHERE status IN ('queued', 'running')")
+                if not _owner_alive(r["owner"])]
+            conn.executemany(
+                "UPDATE jobs SET status = 'failed', error = 'interrupted by restart', finished_at = ? "
+                "WHERE id = ?", [(_now(), job_id) for job_id in stale]
+            )
+
+    def register(self, kind: str, fn: Callable[[JobContext, dict], Any]) -> None:
+        self._handlers[kind] = fn
+
+    @property
+    def kinds(self):
+        return sorted(self._handlers)
+
+    # ---------- Public ----------
+    def submit(self, kind: str, params: Optional[dict] = None) -> str:
+        if kind not in self._handlers:
+            raise KeyError(kind)
+        job_id = uuid.uuid4().hex
+        conn = self.pool.conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, params, created_at, owner) "
+                "VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, json.dumps(params or {}), _now(), _owner())
+            )
+        self._executor.submit(self._run, job_id, kind, params or {})
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self.pool.conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        job["has_file"] = bool(job.pop("result_path"))
+        job.pop("owner", None)
+        return job
+
+    def result_file(self, job_id: str) -> Optional[str]:
+        row = self.pool.conn().execute(
+            "SELECT result_path FROM jobs WHERE id = ? AND status = 'done'", (job_id,)
+        ).fetchone()
+        return row["result_path"] if row else None
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    # ---------- Worker side ----------
+    def _run(self, job_id: str, kind: str, params: dict) -> None:
+        self._update(job_id, status="running", started_at=_now())
+        try:
+            out = self._handlers[kind](JobContext(self, job_id), params)
+            if isinstance(out, dict) and set(out) == {"path"}:
+                self._update(job_id, status="done", progress=1.0, result_path=out["path"],
+                             finished_at=_now())
+            else:
+                self._update(job_id, status="done", progress=1.0, result=json.dumps(out),
+                             finished_at=_now())
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status="failed", error=f"{type(e).__name__}: {e}",
+                         finished_at=_now())
+
+    def _update(self, job_id: str, **fields) -> None:
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        conn = self.pool.conn()
+        with conn:
+            conn.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+
+_OWNER = None  # (pid, token), renewed after a fork
+
+
+def _owner() -> str:
+    global _OWNER
+    if _OWNER is None or _OWNER[0] != os.getpid():
+        _OWNER = (os.getpid(), uuid.uuid4().hex[:12])
+    return f"{_OWNER[0]}:{_OWNER[1]}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """Whether the process that submitted a job is still running."""
+    if not owner:
+        return False  # submitted before owners were recorded
+    pid = int(owner.split(":", 1)[0])
+    if pid == os.getpid():
+        return owner == _owner()  # else an earlier process that had our pid
+    if os.name != "posix":
+        return False  # no multi-process server there; any other pid is gone
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
@@ -0,0 +1,142 @@
+# modules/metrics.py
+"""
+In-process timing metrics.
+
+Histograms live in a module-level registry and are rendered in the
+Prometheus text format by render_prometheus(). Engine/DB/PDF code wraps
+its stages in `timed("stage")`; each stage lands in the
+embryo_stage_seconds histogram and, while a request is being traced
+(see start_trace), in that request's Server-Timing list as well.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels (thread-safe)."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[List[int], float, int]]:
+        with self._lock:
+            return {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, n) in sorted(self.snapshot().items()):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels))
+            sep = "," if base else ""
+            acc = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                acc += c
+                le_s = "+Inf" if le == float("inf") else repr(le)
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{le_s}"}} {acc}')
+            suffix = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {total!r}")
+            lines.append(f"{self.name}_count{suffix} {n}")
+        return lines
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+_REGISTRY: Dict[str, Histogram] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Get or create the histogram `name`."""
+    with _REGISTRY_LOCK:
+        h = _REGISTRY.get(name)
+        if h is None:
+            h = _REGISTRY[name] = Histogram(name, help, labelnames, buckets)
+        return h
+
+
+def render_prometheus() -> str:
+    with _REGISTRY_LOCK:
+        hists = list(_REGISTRY.values())
+    lines = []
+    for h in hists:
+        lines.extend(h.render())
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = histogram("embryo_http_request_duration_seconds",
+                            "Wall time per HTTP request.", ("method", "endpoint", "status"))
+STAGE_SECONDS = histogram("embryo_stage_seconds",
+                          "Wall time per engine/DB/PDF/template stage.", ("stage",))
+
+# (stage, seconds) pairs for the request being handled, if it is traced
+_trace: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = \
+    contextvars.ContextVar("embryo_metrics_trace", default=None)
+
+
+def start_trace() -> contextvars.Token:
+    return _trace.set([])
+
+
+def end_trace(token: contextvars.Token) -> List[Tuple[str, float]]:
+    spans = _trace.get() or []
+    _trace.reset(token)
+    return spans
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage)
+    spans = _trace.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - t0)
+
+
+def server_timing(spans: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """Server-Timing header value; repeated stages are summed, in first-seen order."""
+    agg: Dict[str, List[float]] = {}
+    for stage, sec in spans:
+        a = agg.setdefault(stage, [0.0, 0])
+        a[0] += sec
+        a[1] += 1
+    parts = []
+    for stage, (sec, n) in agg.items():
+        name = stage.replace(".", "_").replace(" ", "_")
+        desc = f';desc="x{n}"' if n > 1 else ""
+        parts.append(f"{name};dur={sec * 1e3:.2f}{desc}")
+    if total is not None:
+        parts.append(f"total;dur={total * 1e3:.2f}")
+    return ", ".join(parts)
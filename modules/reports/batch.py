@@ -0,0 +1,80 @@
+# modules/reports/batch.py
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from modules.reports.pdf import cached_report_path, get_report_pdf
+
+# Below this many un-cached reports a process pool costs more than it saves.
+MIN_POOL_BATCH = 4
+
+# The server is multi-threaded: a plain fork() can copy a lock some other
+# thread holds (the metrics histograms, logging) and hang the child, so pool
+# processes come from a single-threaded fork server (spawn where there's none).
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+
+def _render_one(args: tuple) -> str:
+    return get_report_pdf(*args)
+
+
+def render_reports(out_dir: str, details: List[dict], model_version=None,
+                   workers: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (embryo_id, pdf_path) for each detail, in input order. Reports
+    already cached for this content/model version are reused; the rest are
+    rendered across a process pool.
+    """
+    jobs = [(out_dir, d["embryo_id"], d, model_version) for d in details]
+    todo = [j for j in jobs if not os.path.exists(cached_report_path(*j))]
+    workers = workers or os.cpu_count() or 1
+    if len(todo) < MIN_POOL_BATCH or workers <= 1:
+        for job in jobs:
+            yield job[1], _render_one(job)
+        return
+
+    os.makedirs(out_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=min(workers, len(todo)), mp_context=_MP_CONTEXT) as pool:
+        chunk = max(1, len(todo) // (workers * 4))
+        for job, path in zip(jobs, pool.map(_render_one, jobs, chunksize=chunk)):
+            yield job[1], path
+
+
+class _ZipSink:
+    """Write-only, unseekable target for ZipFile; collects bytes until drained."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts.clear()
+        return out
+
+
+def iter_zip(files: Iterable[Tuple[str, str]]) -> Iterator[bytes]:
+    """
+    Stream a ZIP of (arcname, path) pairs. Each member is flushed as soon as
+    it is added, so the response starts before the last report is rendered.
+    PDFs are already compressed, so members are stored as-is.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+        for arcname, path in files:
+            zf.write(path, arcname)
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
@@ -1,17 +1,80 @@
+import glob
+import hashlib
+import json
 import os
+import re
+import tempfile
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
 from datetime import datetime
 
+from modules.metrics import timed
+
+# Bump when the layout below changes so cached reports are re-rendered.
+REPORT_LAYOUT_VERSION = 1
+
 DISCLAIMER = (
     "This document is a DEMO. No real patient data. Not for clinical use.\n"
     "Results are simulated and for portfolio demonstration only."
 )
 
+def _safe_id(embryo_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(embryo_id))
+
+def report_key(detail: dict, model_version=None) -> str:
+    """Content hash of everything that ends up on the page."""
+    payload = json.dumps(
+        {"detail": detail, "model_version": model_version, "layout": REPORT_LAYOUT_VERSION},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:20]
+
+def cached_report_path(out_dir: str, embryo_id: str, detail: dict, model_version=None) -> str:
+    return os.path.join(out_dir, f"embryo_{_safe_id(embryo_id)}_{report_key(detail, model_version)}.pdf")
+
+def get_report_pdf(out_dir: str, embryo_id: str, detail: dict, model_version=None) -> str:
+    """
+    Return a report for (detail, model_version), rendering only if no report
+    with the same content hash exists yet. Older reports for the embryo are
+    removed once the new one is in place.
+    """
+    path = cached_report_path(out_dir, embryo_id, detail, model_version)
+    if os.path.exists(path):
+        return path
+    _render(path, embryo_id, detail)
+    prefix = f"embryo_{_safe_id(embryo_id)}_"
+    for old in glob.glob(os.path.join(out_dir, glob.escape(prefix) + "*.pdf")):
+        # only this embryo's hashed reports (not e.g. embryo "A_1" when pruning "A")
+        if old != path and re.fullmatch(r"[0-9a-f]{20}", os.path.basename(old)[len(prefix):-4]):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return path
+
 def generate_report_pdf(out_dir: str, embryo_id: str, detail: dict) -> str:
+    path = os.path.join(out_dir, f"embryo_{_safe_id(embryo_id)}_report.pdf")
+    _render(path, embryo_id, detail)
+    return path
+
+def _render(path: str, embryo_id: str, detail: dict) -> None:
+    # Render to a temp file in the same dir, then rename: concurrent requests
+    # for the same embryo never see (or serve) a half-written PDF.
+    out_dir = os.path.dirname(path) or "."
     os.makedirs(out_dir, exist_ok=True)
-    path = os.path.join(out_dir, f"embryo_{embryo_id}_report.pdf")
+    fd, tmp = tempfile.mkstemp(dir=out_dir, prefix=".render-", suffix=".pdf")
+    os.close(fd)
+    try:
+        with timed("pdf_render"):
+            _draw(tmp, embryo_id, detail)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+def _draw(path: str, embryo_id: str, detail: dict) -> None:
     c = canvas.Canvas(path, pagesize=letter)
     width, height = letter
 
@@ -64,4 +127,3 @@ def generate_report_pdf(out_dir: str, embryo_id: str, detail: dict) -> str:
     c.drawString(1*inch, y, "Reviewed by: Dr. Jane Doe, PhD (Demo)")
 
     c.showPage(); c.save()
-    return path
@@ -0,0 +1,79 @@
+# modules/scoring/cache.py
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class ScoreCache:
+    """
+    Score results keyed by model version.
+
+      - detail results live in a bounded LRU keyed by (version, embryo_id)
+      - the full-cohort result (score_all) is materialized once per version
+
+    Entries from an older version are never returned, so a version bump is
+    all it takes to invalidate; clear() just frees the memory early.
+    Cached dicts are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._details: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._all: Optional[tuple] = None  # (version, [detail, ...])
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_detail(self, version: int, embryo_id: str, pos: Optional[int] = None) -> Optional[dict]:
+        """LRU lookup; falls back to row `pos` of the materialized cohort."""
+        key = (version, embryo_id)
+        with self._lock:
+            hit = self._details.get(key)
+            if hit is not None:
+                self._details.move_to_end(key)
+            elif pos is not None and self._all is not None and self._all[0] == version:
+                hit = self._all[1][pos]
+            if hit is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return hit
+
+    def put_detail(self, version: int, embryo_id: str, detail: dict) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._details[(version, embryo_id)] = detail
+            self._details.move_to_end((version, embryo_id))
+            while len(self._details) > self.maxsize:
+                self._details.popitem(last=False)
+                self.evictions += 1
+
+    def get_all(self, version: int) -> Optional[List[dict]]:
+        with self._lock:
+            if self._all is not None and self._all[0] == version:
+                self.hits += 1
+                return self._all[1]
+            self.misses += 1
+            return None
+
+    def put_all(self, version: int, results: List[dict]) -> None:
+        with self._lock:
+            self._all = (version, results)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._details.clear()
+            self._all = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "detail_entries": len(self._details),
+                "maxsize": self.maxsize,
+                "cohort_cached": self._all is not None,
+            }
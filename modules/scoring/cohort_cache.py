@@ -0,0 +1,138 @@
+# modules/scoring/cohort_cache.py
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+from modules.scoring.store import CohortStore
+
+POINTER_FILE = "current.json"
+
+# bytes before a mark's offset that must be unchanged for a later change
+# to the file to count as an append
+TAIL_BYTES = 4096
+
+
+class FileMark:
+    """
+    The part of a CSV a store was built from: its first `offset` bytes, with
+    the file's size/mtime at the time and the header line and the bytes just
+    before `offset`, so a later change can be told apart as an append. A
+    mark without a stat (the file changed while it was loaded) matches no
+    state of the file.
+    """
+
+    def __init__(self, path: str, offset: int, st: Optional[os.stat_result] = None):
+        self.offset = offset
+        self.mtime_ns = st.st_mtime_ns if st is not None else None
+        self.size = st.st_size if st is not None else None
+        self.header = self.tail = b""
+        if st is not None:
+            with open(path, "rb") as f:
+                self.header = f.readline()
+                f.seek(max(0, offset - TAIL_BYTES))
+                self.tail = f.read(offset - max(0, offset - TAIL_BYTES))
+
+
+def _file_sha256(path: str, bufsize: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(bufsize), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _read_pointer(cache_dir: str) -> dict:
+    try:
+        with open(os.path.join(cache_dir, POINTER_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_pointer(cache_dir: str, pointer: dict) -> None:
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, prefix=".current-")
+    with os.fdopen(fd, "w") as f:
+        json.dump(pointer, f)
+    os.replace(tmp, os.path.join(cache_dir, POINTER_FILE))
+
+
+def load_cohort(csv_path: str, cache_dir: Optional[str] = None,
+                chunksize: Optional[int] = None) -> CohortStore:
+    """
+    Load the cohort behind `csv_path`, going through a binary cache if given.
+
+    The cache is a directory per CSV content hash (sha256) holding the store
+    as .npy files; later loads memory-map it, so every worker process shares
+    the same pages through the OS page cache. current.json remembers the
+    CSV's mtime/size → hash, so an unchanged file isn't even re-hashed.
+
+    The store's `source` is a FileMark of the bytes it was loaded from, which
+    is what a CohortWatcher resumes from (also in a process forked later).
+    """
+    st = os.stat(csv_path)
+    store = _load(csv_path, cache_dir, chunksize, st)
+    mark = FileMark(csv_path, st.st_size, st)
+    after = os.stat(csv_path)
+    changed = (after.st_size, after.st_mtime_ns) != (st.st_size, st.st_mtime_ns)
+    store.source = FileMark(csv_path, 0) if changed else mark
+    return store
+
+
+def _load(csv_path: str, cache_dir: Optional[str], chunksize: Optional[int],
+          st: os.stat_result) -> CohortStore:
+    if not cache_dir:
+        return CohortStore.from_csv(csv_path, chunksize=chunksize)
+
+    source = {"path": os.path.abspath(csv_path), "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+    pointer = _read_pointer(cache_dir)
+    if all(pointer.get(k) == v for k, v in source.items()) and pointer.get("sha256"):
+        digest = pointer["sha256"]
+    else:
+        digest = _file_sha256(csv_path)
+
+    entry = os.path.join(cache_dir, digest[:32])
+    if os.path.exists(os.path.join(entry, "meta.json")):
+        try:
+            store = CohortStore.from_dir(entry)
+            store.content_id = digest
+            if pointer.get("sha256") != digest or pointer.get("mtime_ns") != st.st_mtime_ns:
+                _write_pointer(cache_dir, {**source, "sha256": digest})
+            return store
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[cohort-cache] ignoring unreadable cache {entry}: {e}")
+
+    store = CohortStore.from_csv(csv_path, chunksize=chunksize)
+    try:
+        _publish(store, cache_dir, entry, {"source": {**source, "sha256": digest}})
+        _write_pointer(cache_dir, {**source, "sha256": digest})
+        # reopen memory-mapped so this process shares pages with later ones
+        store = CohortStore.from_dir(entry)
+    except OSError as e:
+        print(f"[cohort-cache] could not write cache: {e}")
+    store.content_id = digest
+    return store
+
+
+def _publish(store: CohortStore, cache_dir: str, entry: str, meta: dict) -> None:
+    """Write into a temp dir, then rename into place (atomic on POSIX)."""
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=cache_dir, prefix=".build-")
+    try:
+        store.to_dir(tmp, meta=meta)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # another worker published the same content first
+            if not os.path.exists(os.path.join(entry, "meta.json")):
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    # drop entries for older versions of the CSV
+    for name in os.listdir(cache_dir):
+        full = os.path.join(cache_dir, name)
+        if full != entry and os.path.isdir(full) and not name.startswith("."):
+            shutil.rmtree(full, ignore_errors=True)
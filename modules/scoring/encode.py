@@ -0,0 +1,86 @@
+# modules/scoring/encode.py
+import gzip
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:  # optional: binary responses are only offered when msgpack is installed
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+COLUMNAR_MIME = "application/vnd.embryo.columnar+json"
+MSGPACK_MIME = "application/msgpack"
+
+# format name -> response mimetype; ?format= takes one of these names
+FORMATS = {
+    "json": "application/json",
+    "columnar": COLUMNAR_MIME,
+    "msgpack": MSGPACK_MIME,
+}
+_ACCEPT_ALIASES = {"application/x-msgpack": "msgpack"}
+
+GZIP_MIN_BYTES = 1024
+
+
+def negotiate(format_arg: Optional[str], accept) -> Optional[str]:
+    """
+    Pick a response format from ?format= or the Accept header (a werkzeug
+    MIMEAccept). Returns None if the client asked for something we can't
+    produce (unknown name, or msgpack without the package installed).
+    """
+    if format_arg:
+        fmt = format_arg.lower()
+    else:
+        offers = list(FORMATS.values()) + list(_ACCEPT_ALIASES)
+        best = accept.best_match(offers, default="application/json")
+        fmt = _ACCEPT_ALIASES.get(best) or next(k for k, v in FORMATS.items() if v == best)
+    if fmt not in FORMATS or (fmt == "msgpack" and msgpack is None):
+        return None
+    return fmt
+
+
+def to_columns(items: Sequence[dict]) -> Dict[str, Any]:
+    """
+    Columnar layout of a list of score dicts: one array per field, nested
+    polygenic / monogenic columns keyed by condition / gene, and the
+    per-embryo config hoisted out (it's the same for every row).
+    """
+    first = items[0] if items else {}
+    conditions = list(first.get("polygenic", {}))
+    genes = list(first.get("monogenic", {}))
+    return {
+        "count": len(items),
+        "config": first.get("config"),
+        "conditions": conditions,
+        "genes": genes,
+        "columns": {
+            "embryo_id": [d["embryo_id"] for d in items],
+            "overall_score": [d["overall_score"] for d in items],
+            "polygenic": {c: [d["polygenic"][c] for d in items] for c in conditions},
+            "monogenic": {g: [d["monogenic"][g] for d in items] for g in genes},
+        },
+    }
+
+
+def encode(payload: Any, fmt: str) -> Tuple[bytes, str]:
+    """(body, mimetype) for `payload`; lists are converted for columnar/msgpack."""
+    if fmt == "json":
+        return json.dumps(payload, separators=(",", ":")).encode(), FORMATS[fmt]
+    if isinstance(payload, list):
+        payload = to_columns(payload)
+    elif isinstance(payload, dict) and isinstance(payload.get("items"), list):
+        payload = dict(payload, items=to_columns(payload["items"]))
+    if fmt == "msgpack":
+        return msgpack.packb(payload, use_bin_type=True), FORMATS[fmt]
+    return json.dumps(payload, separators=(",", ":")).encode(), FORMATS[fmt]
+
+
+def maybe_gzip(body: bytes, accept_encoding) -> Tuple[bytes, bool]:
+    """gzip `body` if the client accepts it and it's worth compressing."""
+    if len(body) < GZIP_MIN_BYTES or "gzip" not in accept_encoding:
+        return body, False
+    return gzip.compress(body, compresslevel=5), True
+
+
+def accepted_formats() -> List[str]:
+    return [f for f in FORMATS if f != "msgpack" or msgpack is not None]
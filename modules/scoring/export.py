@@ -0,0 +1,81 @@
+# modules/scoring/export.py
+import csv
+import io
+import json
+from itertools import chain
+from typing import Iterable, Iterator, Sequence
+
+FLUSH_BYTES = 64 * 1024
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "json": "application/json",
+}
+
+
+def iter_ndjson(details: Iterable[dict], flush_bytes: int = FLUSH_BYTES) -> Iterator[bytes]:
+    """
+    One JSON object per line, yielded in ~flush_bytes chunks. The first
+    line goes out on its own so clients see bytes as soon as it's scored.
+    """
+    buf, size = [], 0
+    for i, d in enumerate(details):
+        line = json.dumps(d, separators=(",", ":")) + "\n"
+        buf.append(line)
+        size += len(line)
+        if size >= flush_bytes or i == 0:
+            yield "".join(buf).encode()
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf).encode()
+
+
+def iter_json_array(details: Iterable[dict], flush_bytes: int = FLUSH_BYTES) -> Iterator[bytes]:
+    """A single JSON array, streamed with the same chunking as iter_ndjson."""
+    yield b"["
+    for i, chunk in enumerate(iter_ndjson(details, flush_bytes)):
+        # ndjson lines -> comma-separated array items
+        body = chunk.rstrip(b"\n").replace(b"\n", b",")
+        yield (b"," if i else b"") + body
+    yield b"]"
+
+
+def iter_csv(details: Iterable[dict], conditions: Sequence[str],
+             flush_bytes: int = FLUSH_BYTES) -> Iterator[bytes]:
+    """
+    Flat CSV: embryo_id, overall_score, one column per condition, then one
+    per monogenic gene (status). Like iter_ndjson, the header and first
+    row are flushed immediately, then output goes in ~flush_bytes chunks.
+    """
+    details = iter(details)
+    first = next(details, None)
+    genes = list(first["monogenic"]) if first is not None else []
+    conditions = list(conditions)
+
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(["embryo_id", "overall_score", *conditions, *genes])
+    if first is None:
+        yield out.getvalue().encode()
+        return
+    for i, d in enumerate(chain([first], details)):
+        writer.writerow([d["embryo_id"], d["overall_score"],
+                         *(d["polygenic"][c] for c in conditions),
+                         *(d["monogenic"][g] for g in genes)])
+        if out.tell() >= flush_bytes or i == 0:
+            yield out.getvalue().encode()
+            out.seek(0)
+            out.truncate()
+    if out.tell():
+        yield out.getvalue().encode()
+
+
+def iter_export(details: Iterable[dict], fmt: str, conditions: Sequence[str]) -> Iterator[bytes]:
+    if fmt == "csv":
+        return iter_csv(details, conditions)
+    if fmt == "ndjson":
+        return iter_ndjson(details)
+    if fmt == "json":
+        return iter_json_array(details)
+    raise ValueError(f"unknown export format {fmt!r} (expected one of {sorted(EXPORT_FORMATS)})")
@@ -0,0 +1,145 @@
+# modules/scoring/genotypes.py
+import io
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.scoring.store import ID_CANDIDATES, CohortStore, normalize_columns
+
+# Accepted request bodies for ad-hoc scoring (POST /api/score):
+#   JSON   {"rows": [{"embryo_id": "N1", "snp1": 0, ..., "BRCA1": "carrier"}, ...]}
+#          or {"snp_cols": [...], "dosages": [[...], ...], "ids": [...],
+#              "monogenic": {"BRCA1": [...]}}
+#   CSV    same layout as the cohort CSV (header row required)
+#   .npy   a 2-D (embryos × SNPs) matrix in the engine's snp_cols order
+NPY_TYPES = ("application/x-npy", "application/octet-stream")
+DOSAGE_VALUES = (0.0, 1.0, 2.0)  # alternate-allele copies
+
+
+class GenotypeError(ValueError):
+    """The submitted genotypes can't be scored (bad shape, columns or values)."""
+
+
+class BatchTooLarge(GenotypeError):
+    """The submission has more rows than the caller allows."""
+
+
+def parse_genotypes(body: bytes, content_type: str, snp_cols: List[str],
+                    json_payload: Optional[Any] = None, max_rows: Optional[int] = None,
+                    ids: Optional[List[str]] = None) -> CohortStore:
+    """
+    Turn a request body into a CohortStore aligned to `snp_cols`. Columns
+    other than the ID, SNP and monogenic ones are ignored; missing SNP
+    columns, an empty batch or dosages other than 0/1/2 raise GenotypeError.
+    """
+    ctype = (content_type or "").split(";")[0].strip().lower()
+    if json_payload is not None or ctype == "application/json":
+        df = _frame_from_json(json_payload)
+    elif ctype in ("text/csv", "application/csv"):
+        df = _frame_from_csv(body, max_rows)
+    elif ctype in NPY_TYPES:
+        return _store_from_npy(body, snp_cols, max_rows, ids)
+    else:
+        raise GenotypeError(f"unsupported content type {ctype or '(none)'}; "
+                            "send application/json, text/csv or application/x-npy")
+    if max_rows is not None and len(df) > max_rows:
+        raise BatchTooLarge(f"batch has {len(df)} rows; the limit is {max_rows}")
+    return _store_from_frame(normalize_columns(df), snp_cols)
+
+
+def _frame_from_json(payload: Any) -> pd.DataFrame:
+    if isinstance(payload, list):
+        payload = {"rows": payload}
+    if not isinstance(payload, dict):
+        raise GenotypeError("JSON body must be an object with 'rows' or 'dosages'")
+    if "rows" in payload:
+        rows = payload["rows"]
+        if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+            raise GenotypeError("'rows' must be a list of objects")
+        return pd.DataFrame.from_records(rows)
+    if "dosages" in payload:
+        cols = payload.get("snp_cols")
+        if not isinstance(cols, list):
+            raise GenotypeError("'dosages' needs a matching 'snp_cols' list")
+        try:
+            df = pd.DataFrame(np.asarray(payload["dosages"], dtype=np.float64).reshape(-1, len(cols)),
+                              columns=cols)
+        except (TypeError, ValueError) as e:
+            raise GenotypeError(f"'dosages' must be a numeric (rows × snp_cols) matrix: {e}") from e
+        if payload.get("ids") is not None:
+            if not isinstance(payload["ids"], list):
+                raise GenotypeError("'ids' must be a list")
+            if len(payload["ids"]) != len(df):
+                raise GenotypeError("'ids' length does not match the number of dosage rows")
+            df.insert(0, "embryo_id", [str(i) for i in payload["ids"]])
+        monogenic = payload.get("monogenic") or {}
+        if not isinstance(monogenic, dict):
+            raise GenotypeError("'monogenic' must be an object of {gene: [status, ...]}")
+        for gene, statuses in monogenic.items():
+            if not isinstance(statuses, list):
+                raise GenotypeError(f"monogenic '{gene}' must be a list of statuses")
+            if len(statuses) != len(df):
+                raise GenotypeError(f"monogenic '{gene}' length does not match the number of rows")
+            df[gene] = statuses
+        return df
+    raise GenotypeError("JSON body must have 'rows' or 'dosages'")
+
+
+def _frame_from_csv(body: bytes, max_rows: Optional[int]) -> pd.DataFrame:
+    try:
+        # read one row past the limit so oversize batches are caught cheaply
+        return pd.read_csv(io.BytesIO(body), nrows=None if max_rows is None else max_rows + 1)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        raise GenotypeError(f"could not parse CSV: {e}") from e
+
+
+def _store_from_npy(body: bytes, snp_cols: List[str], max_rows: Optional[int],
+                    ids: Optional[List[str]]) -> CohortStore:
+    try:
+        X = np.load(io.BytesIO(body), allow_pickle=False)
+    except ValueError as e:
+        raise GenotypeError(f"could not read .npy matrix: {e}") from e
+    if X.ndim != 2 or X.shape[1] != len(snp_cols):
+        raise GenotypeError(f"matrix must be (embryos × {len(snp_cols)} SNPs), got shape {X.shape}")
+    if X.dtype.kind not in "iuf":
+        raise GenotypeError(f"matrix must be numeric, got dtype {X.dtype}")
+    if max_rows is not None and len(X) > max_rows:
+        raise BatchTooLarge(f"batch has {len(X)} rows; the limit is {max_rows}")
+    if X.dtype.kind == "f" and not np.all(np.isfinite(X)):
+        raise GenotypeError("matrix contains NaN or infinite dosages")
+    if ids is not None and len(ids) != len(X):
+        raise GenotypeError("ids length does not match the number of matrix rows")
+    df = pd.DataFrame(X, columns=snp_cols)
+    if ids is not None:
+        df.insert(0, "embryo_id", ids)
+    return _store_from_frame(df, snp_cols)
+
+
+def _store_from_frame(df: pd.DataFrame, snp_cols: List[str]) -> CohortStore:
+    if len(df) == 0:
+        raise GenotypeError("no rows to score")
+    missing = [c for c in snp_cols if c not in df.columns]
+    if missing:
+        shown = ", ".join(missing[:10]) + (" ..." if len(missing) > 10 else "")
+        raise GenotypeError(f"missing {len(missing)} SNP column(s): {shown}")
+    dosages = df[snp_cols].apply(pd.to_numeric, errors="coerce")
+    bad = dosages.isna().to_numpy()
+    if bad.any():
+        r, c = map(int, np.argwhere(bad)[0])
+        raise GenotypeError(f"non-numeric or missing dosage at row {r}, column {snp_cols[c]!r}")
+    values = dosages.to_numpy(dtype=np.float64)
+    bad = ~np.isin(values, DOSAGE_VALUES)  # also catches inf
+    if bad.any():
+        r, c = map(int, np.argwhere(bad)[0])
+        raise GenotypeError(f"dosage {values[r, c]:g} at row {r}, column {snp_cols[c]!r} "
+                            "is not 0, 1 or 2")
+    df = df.copy()
+    df[snp_cols] = dosages
+    id_col = next((c for c in ID_CANDIDATES if c in df.columns), None)
+    if id_col is not None:
+        df[id_col] = df[id_col].astype(str)
+    try:
+        return CohortStore.from_frame(df, id_col, snp_cols)
+    except ValueError as e:  # duplicate IDs
+        raise GenotypeError(str(e)) from e
@@ -1,32 +1,177 @@
 # modules/scoring/io.py
+import hashlib
+import json
+import os
 import pickle
+import struct
+import tempfile
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List
 
-def save_engine_state(engine: Any, path: str = "data/weights.pkl") -> None:
+import numpy as np
+
+# Weight store layout (all little-endian):
+#   MAGIC (8 bytes) | header length (uint32) | JSON header | zero padding | weights
+# The weights are one contiguous C-order (SNPs × conditions) array starting at
+# the first 64-byte boundary after the header, so the file can be memory-mapped.
+MAGIC = b"EMBRYOWS"
+SCHEMA_VERSION = 1
+_ALIGN = 64
+_HASH_CHUNK = 1 << 20
+
+
+def _weights_sha256(weights: np.ndarray) -> str:
+    """sha256 of the array's bytes, fed in 1 MiB slices of a memoryview so a
+    memory-mapped store is streamed through the page cache, never copied."""
+    buf = memoryview(np.ascontiguousarray(weights).reshape(-1)).cast("B")
+    h = hashlib.sha256()
+    for start in range(0, len(buf), _HASH_CHUNK):
+        h.update(buf[start:start + _HASH_CHUNK])
+    return h.hexdigest()
+
+
+def save_engine_state(engine: Any, path: str = "data/weights.bin") -> None:
     """
-    Persist the engine's minimal state needed to recreate results.
-    We intentionally store plain Python objects (dicts, floats, etc.)
-    so the pickle remains portable and resilient across code changes.
+    Persist the engine's model state (weights, penalties, config) as a
+    versioned weight store. The file is written to a temp file next to
+    `path` and renamed into place, so readers never see a partial file.
     """
-    payload: Dict[str, Any] = {
-        "condition_weights": getattr(engine, "condition_weights", {}),
-        "monogenic_penalties": getattr(engine, "monogenic_penalties", {}),
-        "config": {
-            "seed": getattr(getattr(engine, "config", None), "seed", None),
-            "scale": getattr(getattr(engine, "config", None), "scale", None),
-        },
+    m = engine.snapshot()  # one consistent model, even if a write lands meanwhile
+    write_weight_store(
+        path,
+        m.weights,
+        snp_cols=m.store.snp_cols,
+        conditions=list(m.condition_names),
+        monogenic_penalties=m.monogenic_penalties,
+        config={"seed": m.config.seed, "scale": m.config.scale},
+    )
+
+
+def _data_offset(header_len: int) -> int:
+    return -(-(len(MAGIC) + 4 + header_len) // _ALIGN) * _ALIGN
+
+
+def write_weight_store(path: str, weights: np.ndarray, snp_cols: List[str],
+                       conditions: List[str], monogenic_penalties: Dict[str, float],
+                       config: Dict[str, Any]) -> None:
+    weights = np.ascontiguousarray(weights, dtype="<f8")
+    header = {
+        "schema_version": SCHEMA_VERSION,
+        "dtype": weights.dtype.str,
+        "shape": list(weights.shape),
+        "snp_cols": list(snp_cols),
+        "conditions": list(conditions),
+        "monogenic_penalties": dict(monogenic_penalties),
+        "config": dict(config),
+        "sha256": _weights_sha256(weights),
     }
+    raw = json.dumps(header).encode()
+    pad = _data_offset(len(raw)) - (len(MAGIC) + 4 + len(raw))
+
     Path(path).parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "wb") as f:
-        pickle.dump(payload, f)
+    fd, tmp = tempfile.mkstemp(dir=str(Path(path).parent), prefix=".weights-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(raw)) + raw + b"\0" * pad)
+            f.write(memoryview(weights.reshape(-1)).cast("B"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
 
-def load_engine_state(path: str = "data/weights.pkl") -> Dict[str, Any]:
+
+def load_engine_state(path: str = "data/weights.bin", mmap: bool = True,
+                      verify: bool = True) -> Dict[str, Any]:
     """
     Load a previously saved engine state. Returns a dict with keys:
-      - condition_weights
+      - weights (SNPs × conditions array, memory-mapped unless mmap=False)
+      - snp_cols, conditions (row / column labels for weights)
       - monogenic_penalties
       - config (dict with seed, scale)
+      - schema_version
+    Legacy pickle files are not unpickled here; convert them once with
+    migrate_legacy_state().
     """
     with open(path, "rb") as f:
-        return pickle.load(f)
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a weight store (legacy pickle? see migrate_legacy_state)")
+        (hlen,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(hlen))
+
+    version = header.get("schema_version")
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"{path}: unsupported weight store schema {version}")
+    shape = tuple(header["shape"])
+    offset = _data_offset(hlen)
+    if mmap and shape[0] * shape[1] > 0:
+        weights = np.memmap(path, dtype=header["dtype"], mode="r", offset=offset, shape=shape)
+    else:
+        weights = np.fromfile(path, dtype=header["dtype"], offset=offset,
+                              count=shape[0] * shape[1]).reshape(shape)
+    if verify and _weights_sha256(weights) != header["sha256"]:
+        raise ValueError(f"{path}: weight checksum mismatch (file corrupt or truncated)")
+
+    return {
+        "weights": weights,
+        "snp_cols": header["snp_cols"],
+        "conditions": header["conditions"],
+        "monogenic_penalties": header["monogenic_penalties"],
+        "config": header["config"],
+        "schema_version": version,
+    }
+
+
+def _load_legacy_pickle(path: str) -> Dict[str, Any]:
+    # Only for migrating files written by older versions of this app;
+    # never point this at a file you didn't write yourself.
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+    return state
+
+
+def apply_engine_state(engine: Any, state: Dict[str, Any]) -> None:
+    """
+    Install a loaded state on the engine as a single new model version.
+    Weights are taken as-is (the config is set without regenerating
+    weights from the seed).
+    """
+    if "weights" not in state and "condition_weights" in state:
+        engine.condition_weights = state["condition_weights"]
+    cfg = state.get("config") or {}
+    config = None
+    if cfg:
+        config = type(engine.config)(
+            seed=engine.config.seed if cfg.get("seed") is None else int(cfg["seed"]),
+            scale=engine.config.scale if cfg.get("scale") is None else float(cfg["scale"]),
+        )
+    engine.update_model(
+        weights=state.get("weights"),
+        snp_cols=state.get("snp_cols"),
+        conditions=state.get("conditions"),
+        monogenic_penalties=state.get("monogenic_penalties"),
+        config=config,
+    )
+
+
+def migrate_legacy_state(legacy_path: str, path: str) -> bool:
+    """
+    Convert a legacy weights.pkl into the weight store at `path`.
+    No-op (returns False) if `path` already exists or there is no legacy file.
+    """
+    if Path(path).exists() or not Path(legacy_path).exists():
+        return False
+    state = _load_legacy_pickle(legacy_path)
+    weights = state.get("condition_weights") or {}
+    conditions = list(weights)
+    snp_cols = list(next(iter(weights.values()), {}))
+    matrix = np.array([[float(weights[c][s]) for c in conditions] for s in snp_cols],
+                      dtype=np.float64).reshape(len(snp_cols), len(conditions))
+
+    write_weight_store(path, matrix, snp_cols=snp_cols, conditions=conditions,
+                       monogenic_penalties=state.get("monogenic_penalties", {}),
+                       config=state.get("config") or {})
+    return True
@@ -0,0 +1,162 @@
+# modules/scoring/parallel.py
+import mmap
+import multiprocessing
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+try:  # optional: keeps each worker's BLAS single-threaded (no oversubscription)
+    from threadpoolctl import threadpool_limits
+except ImportError:  # pragma: no cover
+    threadpool_limits = None
+
+from modules.scoring.store import is_sparse, scipy_sparse
+
+# Workers come from a single-threaded fork server (spawn where there's none):
+# forking the threaded web server could copy a lock another thread holds.
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+if _MP_CONTEXT.get_start_method() == "forkserver":
+    # import numpy/scipy once in the server instead of in every worker
+    # (modules that aren't installed are skipped)
+    _MP_CONTEXT.set_forkserver_preload(["__main__", __name__, "scipy.sparse"])
+
+# Per-worker views onto the shared segments, set up once by _attach().
+_W = {}
+
+# (weakref to dosage matrix, owner pid, spec, segments) of the last matrix
+# shared; a store's dosages never change, so repeat calls reuse it.
+_shared = None
+
+
+def _share(arr: np.ndarray) -> Tuple[shared_memory.SharedMemory, tuple]:
+    """Copy `arr` into a new shared segment; returns (segment, spec for workers)."""
+    shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+    view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+    view[...] = arr
+    return shm, ("shm", shm.name, arr.shape, arr.dtype.str)
+
+
+def _open(spec: tuple) -> Tuple[Optional[shared_memory.SharedMemory], np.ndarray]:
+    if spec[0] == "file":
+        _, path, offset, shape, dtype = spec
+        return None, np.memmap(path, dtype=np.dtype(dtype), mode="r", offset=offset, shape=shape)
+    _, name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _share_array(arr: np.ndarray, segments: list) -> tuple:
+    # a whole memory-mapped file (the cohort cache) is reopened by the
+    # workers, sharing the page cache; anything else is copied once
+    if isinstance(arr, np.memmap) and isinstance(arr.base, mmap.mmap) and arr.flags.c_contiguous:
+        return ("file", arr.filename, arr.offset, arr.shape, arr.dtype.str)
+    shm, spec = _share(np.ascontiguousarray(arr))
+    segments.append(shm)
+    return spec
+
+
+def _release(segments: list, owner: int) -> None:
+    if os.getpid() != owner:
+        return  # inherited through fork; the owner unlinks it
+    while segments:
+        shm = segments.pop()
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _share_dosages(dosages) -> tuple:
+    """
+    The spec _open_dosages takes for a dense or CSR dosage matrix. It is
+    shared on first use and reused until another matrix is shared; the
+    segments are freed with the matrix (or at exit).
+    """
+    global _shared
+    hit = _shared
+    if hit is not None and hit[0]() is dosages and hit[1] == os.getpid():
+        return hit[2]
+    segments = []
+    if is_sparse(dosages):
+        spec = ("csr", tuple(_share_array(part, segments)
+                             for part in (dosages.data, dosages.indices, dosages.indptr)),
+                dosages.shape)
+    else:
+        spec = ("dense", _share_array(dosages, segments))
+    pid = os.getpid()
+    _shared = (weakref.ref(dosages), pid, spec, segments)
+    weakref.finalize(dosages, _release, segments, pid)
+    if hit is not None:
+        _release(hit[3], hit[1])
+    return spec
+
+
+def _open_dosages(spec: tuple):
+    if spec[0] == "csr":
+        opened = [_open(s) for s in spec[1]]
+        X = scipy_sparse().csr_matrix(tuple(a for _, a in opened), shape=spec[2], copy=False)
+        return [shm for shm, _ in opened], X
+    return _open(spec[1])
+
+
+def _attach(dosage_spec: tuple, weight_spec: tuple, out_spec: tuple) -> None:
+    _W["X"] = _open_dosages(dosage_spec)
+    for key, spec in (("W", weight_spec), ("out", out_spec)):
+        _W[key] = _open(spec)
+    if threadpool_limits is not None:
+        _W["limits"] = threadpool_limits(limits=1)
+
+
+def _score_blocks(starts: List[int], block_rows: int) -> int:
+    X, W, out = _W["X"][1], _W["W"][1], _W["out"][1]
+    for start in starts:
+        stop = min(start + block_rows, X.shape[0])
+        # same per-block arithmetic as ScoringEngine._block_logits
+        out[start:stop] = X[start:stop].astype(np.float64, copy=False) @ W
+    return len(starts)
+
+
+def parallel_logits(dosages, weights: np.ndarray, block_rows: int,
+                    workers: Optional[int] = None) -> np.ndarray:
+    """
+    (embryos × conditions) logits computed across a process pool.
+
+    Dosages, weights and the output live in shared memory, so nothing large
+    is pickled to or from workers; the dosages are shared once per matrix
+    (memory-mapped ones by reopening the file) and reused by later calls. Work is split on the same aligned row
+    blocks the serial path uses and each block is computed exactly as it
+    would be serially, so the result is bit-for-bit identical to serial
+    scoring regardless of worker count. CSR dosages are shared as their
+    data/indices/indptr arrays.
+    """
+    workers = workers or os.cpu_count() or 1
+    n = dosages.shape[0]
+    starts = list(range(0, n, block_rows))
+    segments = []
+    try:
+        x_spec = _share_dosages(dosages)
+        w_shm, w_spec = _share(np.ascontiguousarray(weights, dtype=np.float64))
+        segments.append(w_shm)
+        out_shm = shared_memory.SharedMemory(create=True, size=max(1, n * weights.shape[1] * 8))
+        segments.append(out_shm)
+        out_spec = ("shm", out_shm.name, (n, weights.shape[1]), "<f8")
+
+        # contiguous runs of blocks per task; a few tasks per worker for balance
+        per_task = max(1, len(starts) // (workers * 4))
+        tasks = [starts[i:i + per_task] for i in range(0, len(starts), per_task)]
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)) or 1,
+                                 mp_context=_MP_CONTEXT, initializer=_attach,
+                                 initargs=(x_spec, w_spec, out_spec)) as pool:
+            list(pool.map(_score_blocks, tasks, [block_rows] * len(tasks)))
+
+        return np.ndarray((n, weights.shape[1]), dtype=np.float64, buffer=out_shm.buf).copy()
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
@@ -1,113 +1,538 @@
-# modules/scoring/pipeline.py
+import copy
+import hashlib
+import json
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass, replace
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
 import pandas as pd
 import numpy as np
-from typing import Optional
+from itertools import repeat
+
+from modules.metrics import timed
+from modules.scoring.cache import ScoreCache
+from modules.scoring.cohort_cache import load_cohort
+from modules.scoring.parallel import parallel_logits
+from modules.scoring.ranking import RankIndex
+from modules.scoring.store import CohortStore, iter_csv_chunks
+
+# Scores are always computed over fixed, aligned row blocks. BLAS may sum a
+# single row differently than the same row inside a larger matmul, so the
+# detail path scores the block its row lives in; that keeps compute_detailed_scores
+# and score_all bit-for-bit identical.
+SCORE_BLOCK_ROWS = 4096
 
+def _round2(x: np.ndarray) -> np.ndarray:
+    """
+    round(v, 2) for every element, matching Python's round() exactly:
+    np.round agrees except where v*100 sits on a .5 boundary (it rounds
+    the binary product, Python the exact decimal), so those few go through
+    round() itself.
+    """
+    out = np.round(x, 2)
+    scaled = x * 100.0
+    near = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near.any():
+        out[near] = [round(v, 2) for v in x[near].tolist()]
+    return out
+
+@dataclass(frozen=True)
 class EngineConfig:
-    def __init__(self, seed: int = 42, scale: float = 1.0):
-        self.seed = seed
-        self.scale = scale
+    seed: int = 42
+    scale: float = 1.0
+
+@dataclass(frozen=True)
+class ModelSnapshot:
+    """
+    Everything a score depends on, as of one model version. Snapshots are
+    never modified: a change publishes a new one, so a reader holding a
+    snapshot scores against one consistent model without taking locks.
+    """
+    version: int
+    weights_version: int          # moves only when weights or the cohort change
+    store: CohortStore
+    weights: np.ndarray           # (SNPs × conditions), read-only
+    condition_names: Tuple[str, ...]
+    monogenic_penalties: Mapping[str, float]
+    config: EngineConfig
 
 class ScoringEngine:
-    def __init__(self, csv_path: str, config: Optional[EngineConfig] = None):
+    def __init__(self, csv_path: str, config: Optional[EngineConfig] = None,
+                 cache_size: int = 1024, chunksize: Optional[int] = None,
+                 cohort_cache_dir: Optional[str] = None, workers: int = 1,
+                 history: int = 8):
+        # The model lives in an immutable ModelSnapshot (self._model).
+        # Writers build a new snapshot and publish it under _write_lock;
+        # readers take self._model once and never block. Every publish bumps
+        # model_version, which is what the score cache is keyed on; the last
+        # `history` snapshots stay available for version-pinned reads.
+        self._write_lock = threading.RLock()
+        self._history = deque(maxlen=max(1, history))
+        self._logits_memo = None  # (weights_version, embryos × conditions logits)
+        self._rank_memo = None    # (model_version, RankIndex)
+        self._fingerprints = {}   # model_version -> fingerprint()
+        self.cache = ScoreCache(maxsize=cache_size)
+
         self.csv_path = csv_path
-        self.config = config or EngineConfig()
-
-        # Load CSV and normalize column names (lowercase, underscores)
-        df = pd.read_csv(csv_path)
-        df.columns = [str(c).strip() for c in df.columns]
-        norm_map = {c: c.lower().replace(" ", "_") for c in df.columns}
-        df.rename(columns=norm_map, inplace=True)
-
-        # Choose an ID column robustly
-        id_candidates = ["embryo_id", "embryoid", "id", "embryo"]
-        self.id_col = next((c for c in id_candidates if c in df.columns), None)
-        if self.id_col is None:
-            self.id_col = "embryo_id"
-            df[self.id_col] = [f"E{i+1}" for i in range(len(df))]
-
-        # SNP features
-        self.snp_cols = [c for c in df.columns if c.startswith("snp")]
-        if not self.snp_cols:
-            blacklist = {self.id_col, "brca1", "cftr"}
-            self.snp_cols = [c for c in df.columns
-                             if c not in blacklist and pd.api.types.is_numeric_dtype(df[c])]
-
-        self.embryos = df
-
-        # RNG + toy weights
-        self.rng = np.random.default_rng(self.config.seed)
-        self.condition_names = ["Diabetes", "HeartDisease", "Alzheimers"]
-        self.condition_weights = {
-            cond: {c: float(self.rng.normal()) for c in self.snp_cols}
-            for cond in self.condition_names
+        self.workers = workers  # >1: score_all spreads blocks over a process pool
+
+        # Load CSV (optionally streamed in chunks) into the compact row store;
+        # column names are normalized and ID/SNP columns detected there.
+        # With cohort_cache_dir, later starts memory-map a binary copy instead.
+        # Mostly-zero panels are stored as CSR and scored with sparse-dense
+        # products (see store.use_sparse).
+        with timed("cohort_load"):
+            store = load_cohort(csv_path, cohort_cache_dir, chunksize=chunksize)
+
+        # toy weights as a (SNPs × conditions) matrix;
+        # penalty keys are lowercase to match normalized columns
+        config = config or EngineConfig()
+        conditions = ("Diabetes", "HeartDisease", "Alzheimers")
+        self._model = None
+        self._publish(
+            store=store,
+            weights=self._draw_weights(config.seed, conditions, store.snp_cols),
+            condition_names=conditions,
+            monogenic_penalties={"brca1": 15.0, "cftr": 10.0},
+            config=config,
+        )
+
+    # ---------- Model snapshots ----------
+    def _publish(self, **changes) -> ModelSnapshot:
+        """Install a new snapshot with `changes` applied; returns it."""
+        with self._write_lock:
+            old = self._model
+            new_logits = changes.pop("_relogit", False) or "weights" in changes or "store" in changes
+            if "weights" in changes:
+                w = np.asarray(changes["weights"])
+                if w.flags.writeable:
+                    w = w.view()
+                    w.flags.writeable = False
+                changes["weights"] = w
+            if "condition_names" in changes:
+                changes["condition_names"] = tuple(changes["condition_names"])
+            if "monogenic_penalties" in changes:
+                changes["monogenic_penalties"] = MappingProxyType(dict(changes["monogenic_penalties"]))
+            if old is None:
+                new = ModelSnapshot(version=1, weights_version=1, **changes)
+            else:
+                new = replace(old, version=old.version + 1,
+                              weights_version=old.weights_version + int(new_logits), **changes)
+            self._model = new
+            self._history.append(new)
+            retained = set(self.versions)
+            self._fingerprints = {v: f for v, f in self._fingerprints.items() if v in retained}
+            self.cache.clear()
+            return new
+
+    def snapshot(self, version: Optional[int] = None) -> ModelSnapshot:
+        """
+        The current model, or an earlier one still in the history.
+        KeyError if `version` is no longer (or was never) retained.
+        """
+        model = self._model
+        if version is None or version == model.version:
+            return model
+        for snap in list(self._history):
+            if snap.version == version:
+                return snap
+        raise KeyError(version)
+
+    def fingerprint(self, version: Optional[int] = None) -> str:
+        """
+        Digest of everything the scores of a model version depend on: the
+        cohort's content, weights, penalties, config and conditions. Unlike
+        model_version (a counter that starts over in every process) it is
+        stable across restarts and workers for the same inputs, and differs
+        whenever they differ.
+        """
+        m = self.snapshot(version)
+        fp = self._fingerprints.get(m.version)
+        if fp is None:
+            h = hashlib.sha256(json.dumps([
+                m.store.content_id, list(m.condition_names), dict(m.monogenic_penalties),
+                asdict(m.config), m.weights.dtype.str, list(m.weights.shape),
+            ]).encode())
+            h.update(np.ascontiguousarray(m.weights))
+            fp = h.hexdigest()
+            self._fingerprints[m.version] = fp
+        return fp
+
+    @property
+    def versions(self) -> list:
+        """Model versions that can still be pinned, oldest first."""
+        return [s.version for s in list(self._history)]
+
+    @property
+    def model_version(self) -> int:
+        return self._model.version
+
+    @property
+    def weights_version(self) -> int:
+        return self._model.weights_version
+
+    # The cohort lives in the snapshot's store; `embryos` is a compact frame
+    # built on demand, and assigning a frame rebuilds the store.
+    @property
+    def store(self) -> CohortStore:
+        return self._model.store
+
+    @property
+    def id_col(self) -> str:
+        return self._model.store.id_col
+
+    @property
+    def snp_cols(self) -> list:
+        return self._model.store.snp_cols
+
+    @property
+    def embryos(self) -> pd.DataFrame:
+        return self.store.to_frame()
+
+    @embryos.setter
+    def embryos(self, df: pd.DataFrame) -> None:
+        self._set_store(CohortStore.from_frame(df, self.id_col, self.snp_cols))
+
+    def _set_store(self, store: CohortStore) -> None:
+        # same SNP panel keeps the weights; otherwise redraw from the seed
+        with self._write_lock:
+            m = self._model
+            if store.snp_cols == m.store.snp_cols:
+                self._publish(store=store)
+            else:
+                self._publish(store=store, weights=self._draw_weights(
+                    m.config.seed, m.condition_names, store.snp_cols))
+
+    # Assigning any of these publishes a new snapshot (which invalidates
+    # cached scores); the values handed out are read-only.
+    @property
+    def condition_names(self) -> list:
+        return list(self._model.condition_names)
+
+    @property
+    def condition_weights(self) -> dict:
+        """{condition: {snp: weight}} view of the weight matrix (a copy)."""
+        m = self._model
+        return {
+            cond: dict(zip(m.store.snp_cols, m.weights[:, j].tolist()))
+            for j, cond in enumerate(m.condition_names)
         }
-        # keep keys lowercase to match normalized columns
-        self.monogenic_penalties = {"brca1": 15.0, "cftr": 10.0}
+
+    @condition_weights.setter
+    def condition_weights(self, value: dict) -> None:
+        conds = list(value)
+        snp_cols = self.snp_cols
+        W = np.empty((len(snp_cols), len(conds)), dtype=np.float64)
+        for j, cond in enumerate(conds):
+            w = value[cond]
+            W[:, j] = [float(w[c]) for c in snp_cols]
+        self.set_weight_matrix(W, conditions=conds)
+
+    def set_weight_matrix(self, weights: np.ndarray, snp_cols: Optional[list] = None,
+                          conditions: Optional[list] = None) -> None:
+        """
+        Install a (SNPs × conditions) weight matrix. Rows are reordered to
+        this cohort's snp_cols when `snp_cols` is given in a different order;
+        a matrix already in order (e.g. memory-mapped from a weight store) is
+        used as-is without copying.
+        """
+        self.update_model(weights=weights, snp_cols=snp_cols, conditions=conditions)
+
+    def update_model(self, weights: Optional[np.ndarray] = None, snp_cols: Optional[list] = None,
+                     conditions: Optional[list] = None,
+                     monogenic_penalties: Optional[dict] = None,
+                     config: Optional[EngineConfig] = None) -> ModelSnapshot:
+        """
+        Replace any of weights / penalties / config as one new version:
+        readers see either the old model or the new one, never a mix.
+        """
+        changes = {}
+        with self._write_lock:
+            m = self._model
+            if weights is not None:
+                changes["weights"], changes["condition_names"] = self._checked_weights(
+                    m, weights, snp_cols, conditions)
+            if monogenic_penalties is not None:
+                changes["monogenic_penalties"] = monogenic_penalties
+            if config is not None:
+                changes["config"] = config
+            return self._publish(**changes)
+
+    @staticmethod
+    def _checked_weights(m: ModelSnapshot, weights, snp_cols, conditions):
+        weights = np.asarray(weights)
+        if weights.ndim != 2:
+            raise ValueError(f"weight matrix must be 2-D, got shape {weights.shape}")
+        cohort_snps = m.store.snp_cols
+        if snp_cols is not None and list(snp_cols) != cohort_snps:
+            pos = {c: i for i, c in enumerate(snp_cols)}
+            missing = [c for c in cohort_snps if c not in pos]
+            if missing:
+                raise KeyError(f"weights missing SNP columns: {missing[:5]}")
+            weights = weights[[pos[c] for c in cohort_snps]]
+        if weights.shape[0] != len(cohort_snps):
+            raise ValueError(f"weight matrix has {weights.shape[0]} rows, "
+                             f"cohort has {len(cohort_snps)} SNP columns")
+        names = list(conditions) if conditions is not None else list(m.condition_names)
+        if weights.shape[1] != len(names):
+            raise ValueError("weight matrix columns do not match condition names")
+        if weights.dtype != np.float64:
+            weights = weights.astype(np.float64)
+        return weights, names
+
+    @staticmethod
+    def _draw_weights(seed: int, conditions, snp_cols) -> np.ndarray:
+        # fresh rng per draw; draws are condition-major, the same sequence
+        # as one rng.normal() per (condition, snp) pair
+        with timed("weight_generation"):
+            rng = np.random.default_rng(seed)
+            draws = rng.normal(size=(len(conditions), len(snp_cols)))
+            return np.ascontiguousarray(draws.T)
+
+    @property
+    def monogenic_penalties(self) -> Mapping[str, float]:
+        return self._model.monogenic_penalties
+
+    @monogenic_penalties.setter
+    def monogenic_penalties(self, value: dict) -> None:
+        self._publish(monogenic_penalties=value)
+
+    @property
+    def config(self) -> EngineConfig:
+        return self._model.config
+
+    @config.setter
+    def config(self, value: EngineConfig) -> None:
+        self._publish(config=value)
+
+    def invalidate(self) -> None:
+        """Drop cached scores (and logits) by publishing a fresh version."""
+        self._publish(_relogit=True)
+
+    def cache_stats(self) -> dict:
+        store = self.store
+        return {"model_version": self.model_version, "pinnable_versions": self.versions,
+                "dosage_layout": "csr" if store.sparse else "dense",
+                "dosage_density": round(store.density, 4),
+                "dosage_bytes": store.dosage_nbytes,
+                **self.cache.stats()}
 
     # ---------- Config ----------
     def update_config(self, seed: Optional[int] = None, scale: Optional[float] = None) -> bool:
-        if seed is not None:
-            self.config.seed = int(seed)
-        if scale is not None:
-            self.config.scale = float(scale)
-        # reinit rng + weights so config changes take effect
-        self.rng = np.random.default_rng(self.config.seed)
-        for cond in self.condition_weights:
-            self.condition_weights[cond] = {c: float(self.rng.normal()) for c in self.snp_cols}
+        # Only a new seed needs new weights (and new logits). scale just
+        # divides the cached logits and penalties only shift overall_score,
+        # so those changes re-run the cheap downstream stage. Either way it's
+        # one publish: nobody sees the new seed paired with the old weights.
+        with self._write_lock:
+            m = self._model
+            config = replace(m.config,
+                             seed=m.config.seed if seed is None else int(seed),
+                             scale=m.config.scale if scale is None else float(scale))
+            if config.seed != m.config.seed:
+                self._publish(config=config, weights=self._draw_weights(
+                    config.seed, m.condition_names, m.store.snp_cols))
+            else:
+                self._publish(config=config)
         return True
 
+    # ---------- Hot reload ----------
+    def with_store(self, store: CohortStore, reuse_rows: int = 0) -> "ScoringEngine":
+        """
+        New engine over `store` carrying this engine's model (weights,
+        penalties, config); this engine is left untouched for readers that
+        still hold it. Weights are kept when the SNP panel still covers them
+        and regenerated from the seed otherwise.
+
+        `reuse_rows` says the first rows of `store` are this cohort's first
+        rows unchanged (an append): cached logits for them are carried over
+        up to the last whole scoring block, so only the tail is recomputed
+        and results stay bit-identical to a fresh engine.
+        """
+        m = self._model
+        new = copy.copy(self)
+        new._write_lock = threading.RLock()
+        new._history = deque(maxlen=self._history.maxlen)
+        new.cache = ScoreCache(maxsize=self.cache.maxsize)
+        new._logits_memo = None
+        new._rank_memo = None
+        new._fingerprints = {}
+        try:
+            W, _ = self._checked_weights(replace(m, store=store), m.weights,
+                                         m.store.snp_cols, m.condition_names)
+            kept = True
+        except (KeyError, ValueError):
+            W, kept = self._draw_weights(m.config.seed, m.condition_names, store.snp_cols), False
+        new._model = m
+        snap = new._publish(store=store, weights=W)
+
+        memo = self._logits_memo
+        keep = (min(reuse_rows, len(m.store)) // SCORE_BLOCK_ROWS) * SCORE_BLOCK_ROWS
+        if kept and keep and memo is not None and memo[0] == m.weights_version \
+                and store.snp_cols == m.store.snp_cols:
+            logits = np.empty((len(store), W.shape[1]), dtype=np.float64)
+            logits[:keep] = memo[1][:keep]
+            for start in range(keep, len(store), SCORE_BLOCK_ROWS):
+                logits[start:start + SCORE_BLOCK_ROWS] = self._block_logits(store, start, snap.weights)
+            new._logits_memo = (snap.weights_version, logits)
+        return new
+
     # ---------- Helpers ----------
-    def _sigmoid(self, x: float) -> float:
+    def _sigmoid(self, x):
         return 1.0 / (1.0 + np.exp(-x))
 
-    def _polygenic_logit(self, row, condition: str) -> float:
-        w = self.condition_weights[condition]
-        return float(sum(float(row[c]) * float(w[c]) for c in self.snp_cols))
+    def _block_logits(self, store: CohortStore, start: int, weights: np.ndarray) -> np.ndarray:
+        """Raw logits for the aligned block starting at `start` (one matmul)."""
+        with timed("logits"):
+            return store.block(start, SCORE_BLOCK_ROWS) @ weights
+
+    def _cohort_logits(self, m: ModelSnapshot, workers: int = 1) -> np.ndarray:
+        """Raw logits for the whole cohort, kept until weights or data change."""
+        memo = self._logits_memo
+        if memo is not None and memo[0] == m.weights_version:
+            return memo[1]
+        store, W = m.store, m.weights
+        if workers > 1 and len(store) > SCORE_BLOCK_ROWS:
+            with timed("logits"):
+                logits = parallel_logits(store.dosages, W, SCORE_BLOCK_ROWS, workers)
+        else:
+            logits = np.empty((len(store), W.shape[1]), dtype=np.float64)
+            for start in range(0, len(store), SCORE_BLOCK_ROWS):
+                logits[start:start + SCORE_BLOCK_ROWS] = self._block_logits(store, start, W)
+        if m.weights_version == self._model.weights_version:  # don't memo pinned reads
+            self._logits_memo = (m.weights_version, logits)
+        return logits
+
+    @timed("score_rows")
+    def _finish_rows(self, m: ModelSnapshot, store: CohortStore, logits: np.ndarray,
+                     rows: slice) -> list:
+        """Sigmoid, penalties, overall score and rounding as array ops over
+        `rows`; Python only assembles the result dicts."""
+        conds = m.condition_names
+        pct = _round2(100.0 * self._sigmoid(logits / m.config.scale))
+
+        risk = 0
+        for j in range(pct.shape[1]):
+            risk = risk + 0.30 * pct[:, j]
+
+        genes = list(store.monogenic)
+        penalty = 0
+        for gene in genes:
+            carrier = store.carriers(gene, rows)
+            penalty = penalty + np.where(carrier, m.monogenic_penalties[gene.lower()], 0.0)
 
-    def _polygenic_probability(self, row, condition: str) -> float:
-        z = self._polygenic_logit(row, condition)
-        return float(self._sigmoid(z / self.config.scale))
+        total = _round2(np.broadcast_to(100.0 - risk - penalty, (pct.shape[0],)).astype(np.float64))
+        overall = total.tolist()
+        if (total <= 0).any():  # max(0, score): an int 0, as the scalar formula gives
+            overall = [t if t > 0 else 0 for t in overall]
+        ids = store.ids[rows].tolist()
+        polygenic = map(dict, map(zip, repeat(conds), pct.tolist()))
+        seed, scale = m.config.seed, m.config.scale
+        # monogenic dicts don't depend on the model: shared across versions
+        return [
+            {"embryo_id": eid, "polygenic": poly, "monogenic": mono,
+             "overall_score": score, "config": {"seed": seed, "scale": scale}}
+            for eid, poly, mono, score in zip(ids, polygenic, store.monogenic_rows(rows), overall)
+        ]
 
-    def _row_for_id(self, embryo_id: str):
-        m = self.embryos[self.embryos[self.id_col] == embryo_id]
-        if m.empty:
-            raise KeyError(embryo_id)
-        return m.iloc[0]
+    def _row_for_id(self, embryo_id: str, m: Optional[ModelSnapshot] = None) -> int:
+        # O(1) lookup in the prebuilt ID index; KeyError if unknown
+        return (m or self._model).store.position(embryo_id)
 
     # ---------- Public ----------
-    def compute_detailed_scores(self, embryo_id: str) -> dict:
-        row = self._row_for_id(embryo_id)
+    # Each call takes one snapshot up front and scores against it only;
+    # `version` pins an earlier model that is still in the history.
+    def compute_detailed_scores(self, embryo_id: str, version: Optional[int] = None) -> dict:
+        embryo_id = str(embryo_id)
+        m = self.snapshot(version)
+        pos = self._row_for_id(embryo_id, m)
+        detail = self.cache.get_detail(m.version, embryo_id, pos)
+        if detail is not None:
+            return detail
 
-        polygenic = {
-            cond: round(100.0 * self._polygenic_probability(row, cond), 2)
-            for cond in self.condition_weights
-        }
+        memo = self._logits_memo
+        if memo is not None and memo[0] == m.weights_version:
+            row = memo[1][pos:pos + 1]
+        else:
+            start = pos - pos % SCORE_BLOCK_ROWS
+            row = self._block_logits(m.store, start, m.weights)[pos - start:pos - start + 1]
+        detail = self._finish_rows(m, m.store, row, slice(pos, pos + 1))[0]
+        self.cache.put_detail(m.version, embryo_id, detail)
+        return detail
 
-        # monogenic flags (treat missing as 'negative')
-        def get_flag(col):
-            col_l = col.lower()
-            if col_l in self.embryos.columns:
-                return str(row[col_l])
-            col_u = col.upper()
-            if col_u in self.embryos.columns:
-                return str(row[col_u])
-            return "negative"
+    def score_all(self, workers: Optional[int] = None, version: Optional[int] = None):
+        m = self.snapshot(version)
+        cohort = self.cache.get_all(m.version)
+        if cohort is None:
+            logits = self._cohort_logits(m, workers or self.workers)
+            cohort = list(self._score_store(m, m.store, logits))
+            if self._model is m:  # a pinned read mustn't evict the current cohort
+                self.cache.put_all(m.version, cohort)
+        # new list so callers can sort without reordering the cached cohort
+        return list(cohort)
 
-        monogenic = {"BRCA1": get_flag("brca1"), "CFTR": get_flag("cftr")}
+    def ranking(self, version: Optional[int] = None) -> RankIndex:
+        """Sorted/filterable index over the scores (rebuilt per model version)."""
+        m = self.snapshot(version)
+        memo = self._rank_memo
+        if memo is not None and memo[0] == m.version:
+            return memo[1]
+        index = RankIndex(self.score_all(version=m.version), m.condition_names)
+        if self._model is m:
+            self._rank_memo = (m.version, index)
+        return index
 
-        risk_component = sum(0.30 * pct for pct in polygenic.values())
-        penalty = sum(self.monogenic_penalties[g.lower()]
-                      for g, s in monogenic.items() if str(s).lower() == "carrier")
-        overall = max(0, round(100.0 - risk_component - penalty, 2))
+    def iter_scores(self, source: Optional[str] = None, chunksize: int = SCORE_BLOCK_ROWS,
+                    version: Optional[int] = None):
+        """
+        Yield detail dicts one embryo at a time, scoring block by block.
 
-        return {
-            "embryo_id": str(row[self.id_col]),
-            "polygenic": polygenic,
-            "monogenic": monogenic,
-            "overall_score": overall,
-            "config": {"seed": self.config.seed, "scale": self.config.scale},
-        }
+        Without `source` this walks the loaded cohort (reusing the cached
+        score_all result if there is one). With a CSV path it streams that
+        file in `chunksize` rows using the current model, so the cohort is
+        never held in memory. Chunks are rounded to whole scoring blocks,
+        so results match score_all on the same rows exactly.
+        """
+        m = self.snapshot(version)
+        if source is None:
+            cohort = self.cache.get_all(m.version)
+            memo = self._logits_memo
+            if cohort is not None:
+                yield from cohort
+            elif memo is not None and memo[0] == m.weights_version:
+                yield from self._score_store(m, m.store, memo[1])
+            else:
+                yield from self._score_store(m, m.store)
+            return
+
+        rows = max(1, chunksize // SCORE_BLOCK_ROWS) * SCORE_BLOCK_ROWS
+        n = 0
+        snp_cols = m.store.snp_cols
+        for chunk in iter_csv_chunks(source, rows):
+            missing = [c for c in snp_cols if c not in chunk.columns]
+            if missing:
+                raise ValueError(f"{source}: missing SNP columns {missing[:5]}")
+            part = CohortStore.from_frame(chunk, m.store.id_col, snp_cols, id_offset=n)
+            n += len(part)
+            yield from self._score_store(m, part)
+
+    def score_batch(self, store: CohortStore, version: Optional[int] = None):
+        """
+        Yield detail dicts for embryos outside the cohort (e.g. a lab
+        submission), scored block by block with the current (or pinned)
+        model. Nothing is cached and the cohort is left as it is.
+        """
+        m = self.snapshot(version)
+        if store.snp_cols != m.store.snp_cols:
+            raise ValueError("batch SNP columns must match the cohort's snp_cols order")
+        yield from self._score_store(m, store)
 
-    def score_all(self):
-        return [self.compute_detailed_scores(str(eid)) for eid in self.embryos[self.id_col]]
+    def _score_store(self, m: ModelSnapshot, store: CohortStore, logits: Optional[np.ndarray] = None):
+        # `logits` may be precomputed for the whole store (parallel path)
+        for start in range(0, len(store), SCORE_BLOCK_ROWS):
+            if logits is None:
+                block = self._block_logits(store, start, m.weights)
+            else:
+                block = logits[start:start + SCORE_BLOCK_ROWS]
+            yield from self._finish_rows(m, store, block, slice(start, start + len(block)))
@@ -0,0 +1,133 @@
+# modules/scoring/ranking.py
+import base64
+import json
+import operator
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+OPS = {
+    "<": operator.lt, "<=": operator.le,
+    ">": operator.gt, ">=": operator.ge,
+    "=": operator.eq, "==": operator.eq, "!=": operator.ne,
+}
+_FILTER_RE = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*)\s*(<=|>=|==|!=|<|>|=)\s*(-?[0-9.]+)\s*$")
+
+Filter = Tuple[str, str, float]
+
+
+def parse_filter(expr: str) -> Filter:
+    """'HeartDisease<20' -> ('HeartDisease', '<', 20.0); ValueError if malformed."""
+    m = _FILTER_RE.match(expr)
+    if not m:
+        raise ValueError(f"bad filter {expr!r} (expected e.g. HeartDisease<20)")
+    return m.group(1), m.group(2), float(m.group(3))
+
+
+def parse_query_filters(args) -> List[Filter]:
+    """
+    Threshold filters from request args. Accepts ?filter=HeartDisease<20
+    (repeatable) as well as bare ?HeartDisease<20 / ?overall_score>=50,
+    which arrive as key 'HeartDisease<20' or key 'overall_score>' = '50'.
+    """
+    out = [parse_filter(f) for f in args.getlist("filter")]
+    for key, value in args.items(multi=True):
+        if key.endswith(("<", ">", "!")):
+            out.append(parse_filter(f"{key}={value}"))
+        elif any(op in key for op in "<>") and value == "":
+            out.append(parse_filter(key))
+    return out
+
+
+class RankIndex:
+    """
+    Sorted views over one model version's scores.
+
+    Built once per version from the score_all result: per-field score arrays
+    plus carrier flags. Full sort orders are computed lazily per field and
+    reused; top-K without a cached order uses argpartition (O(N)).
+    Ties keep cohort order, so paging is deterministic.
+    """
+
+    def __init__(self, cohort: Sequence[dict], conditions: Sequence[str]):
+        n = len(cohort)
+        self.fields: Dict[str, np.ndarray] = {
+            "overall_score": np.fromiter((d["overall_score"] for d in cohort), dtype=np.float64, count=n)
+        }
+        for cond in conditions:
+            self.fields[cond] = np.fromiter((d["polygenic"][cond] for d in cohort),
+                                            dtype=np.float64, count=n)
+        self.carrier = np.fromiter(
+            (any(str(s).lower() == "carrier" for s in d["monogenic"].values()) for d in cohort),
+            dtype=bool, count=n)
+        self._orders: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.carrier)
+
+    def _order(self, field: str, descending: bool = True) -> np.ndarray:
+        """Row positions sorted by `field` (stable: ties stay in cohort order)."""
+        key = (field, descending)
+        order = self._orders.get(key)
+        if order is None:
+            vals = self.fields[field]
+            order = np.argsort(-vals if descending else vals, kind="stable")
+            self._orders[key] = order
+        return order
+
+    def _top(self, field: str, k: int) -> np.ndarray:
+        """First k positions of _order(field) without a full sort."""
+        vals = self.fields[field]
+        if k <= 0:
+            return np.array([], dtype=np.intp)
+        kth = -np.partition(-vals, k - 1)[k - 1]
+        above = np.flatnonzero(vals > kth)
+        ties = np.flatnonzero(vals == kth)[:k - len(above)]
+        top = np.concatenate([above, ties])
+        return top[np.lexsort((top, -vals[top]))]
+
+    def query(self, sort: str = "overall_score", descending: bool = True,
+              filters: Sequence[Filter] = (), carrier: Optional[bool] = None,
+              offset: int = 0, limit: Optional[int] = None) -> Tuple[np.ndarray, int]:
+        """
+        Row positions for one page plus the total number of matching rows.
+        Raises KeyError for unknown sort/filter fields.
+        """
+        if sort not in self.fields:
+            raise KeyError(sort)
+        mask = None
+        for field, op, value in filters:
+            if field not in self.fields:
+                raise KeyError(field)
+            m = OPS[op](self.fields[field], value)
+            mask = m if mask is None else mask & m
+        if carrier is not None:
+            m = self.carrier if carrier else ~self.carrier
+            mask = m if mask is None else mask & m
+
+        end = None if limit is None else offset + limit
+        if (mask is None and descending and end is not None
+                and (sort, True) not in self._orders and end < len(self) // 8):
+            # top-K: partial selection, then order just those K
+            return self._top(sort, end)[offset:], len(self)
+
+        order = self._order(sort, descending)
+        if mask is not None:
+            order = order[mask[order]]
+        return order[offset:end], len(order)
+
+
+def encode_cursor(model_version: int, offset: int, query_key: str) -> str:
+    raw = json.dumps({"v": model_version, "o": offset, "q": query_key}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """ValueError if the cursor isn't one of ours."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return {"v": int(data["v"]), "o": int(data["o"]), "q": str(data["q"])}
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
@@ -0,0 +1,199 @@
+# modules/scoring/reload.py
+import io
+import os
+import threading
+from typing import Callable, Optional
+
+import pandas as pd
+
+from modules.metrics import timed
+from modules.scoring.cohort_cache import FileMark, load_cohort
+from modules.scoring.store import CohortStore, normalize_columns
+
+
+class EngineHolder:
+    """
+    The engine currently serving requests. Readers take `current` once and
+    use that object for the whole request; a reload builds a new engine and
+    swaps the reference, so nobody ever sees a half-updated cohort.
+
+    With `factory` instead of an engine, the first `current` builds it
+    (unless a swap got there first).
+    """
+
+    def __init__(self, engine=None, factory: Optional[Callable[[], object]] = None):
+        self._engine = engine
+        self._factory = factory
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    @property
+    def current(self):
+        engine = self._engine
+        if engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._engine = self._factory()
+                engine = self._engine
+        return engine
+
+    def swap(self, engine) -> None:
+        with self._lock:
+            self._engine = engine
+            self.generation += 1
+
+    def swap_if(self, expected, expected_version: int, engine) -> bool:
+        """Swap only if `expected` is still current and its model hasn't changed."""
+        with self._lock:
+            if self._engine is not expected or expected.model_version != expected_version:
+                return False
+            self._engine = engine
+            self.generation += 1
+            return True
+
+
+class CohortWatcher:
+    """
+    Polls the cohort CSV and hot-swaps the engine in `holder` when it changes.
+
+    Appends (the file only grew past what was ingested) are parsed on their
+    own and concatenated onto the current store; any other change reloads
+    the whole file (through the binary cohort cache, if configured). Either
+    way the new engine is built and, if the old one had a scored cohort
+    cached, pre-scored on the watcher thread before it is swapped in.
+    Rows in a partially written last line are left for the next poll.
+
+    What has been ingested is read off the serving engine's store (its
+    `source` FileMark), not remembered here, so a watcher in a forked worker
+    resumes from exactly what the inherited engine holds.
+    """
+
+    def __init__(self, holder: EngineHolder, csv_path: str, interval: float = 2.0,
+                 cohort_cache_dir: Optional[str] = None, chunksize: Optional[int] = None):
+        self.holder = holder
+        self.csv_path = csv_path
+        self.interval = interval
+        self.cohort_cache_dir = cohort_cache_dir
+        self.chunksize = chunksize
+        self.reloads = {"append": 0, "full": 0, "failed": 0}
+        self._adopted = None  # (store, FileMark) for a store not loaded from the CSV
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._check_lock = threading.Lock()
+
+    def start(self) -> "CohortWatcher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="cohort-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:  # keep serving the old engine
+                self.reloads["failed"] += 1
+                print(f"[cohort-watcher] reload failed: {e}")
+
+    def _mark_for(self, store: CohortStore) -> FileMark:
+        if store.source is not None:
+            return store.source
+        # built some other way (e.g. assigned in code): keep it until the
+        # CSV is next edited, then reload the whole file
+        if self._adopted is None or self._adopted[0] is not store:
+            self._adopted = (store, FileMark(self.csv_path, 0, os.stat(self.csv_path)))
+        return self._adopted[1]
+
+    def check(self) -> Optional[str]:
+        """Reload if the CSV changed; returns 'append', 'full' or None."""
+        with self._check_lock:
+            try:
+                st = os.stat(self.csv_path)
+            except FileNotFoundError:
+                return None  # mid-replace; try again next poll
+            old = self.holder.current
+            mark = self._mark_for(old.store)
+            if st.st_mtime_ns == mark.mtime_ns and st.st_size == mark.size:
+                return None
+            with timed("cohort_reload"):
+                kind, done = "full", False
+                if self._is_append(mark, st.st_size):
+                    try:
+                        kind, done = "append", self._ingest_append(old, mark, st)
+                    except ValueError as e:  # e.g. duplicate IDs: let a full parse decide
+                        print(f"[cohort-watcher] append not usable ({e}); reloading whole file")
+                        kind = "full"
+                if kind == "full":
+                    done = self._reload_full()
+            if not done:
+                return None
+            self.reloads[kind] += 1
+            return kind
+
+    def _is_append(self, mark: FileMark, size: int) -> bool:
+        if size <= mark.offset or not mark.tail.endswith(b"\n"):
+            return False
+        with open(self.csv_path, "rb") as f:
+            if f.readline() != mark.header:
+                return False
+            f.seek(mark.offset - len(mark.tail))
+            return f.read(len(mark.tail)) == mark.tail
+
+    def _ingest_append(self, old, mark: FileMark, st: os.stat_result) -> bool:
+        with open(self.csv_path, "rb") as f:
+            f.seek(mark.offset)
+            new = f.read(st.st_size - mark.offset)
+        complete = new.rfind(b"\n") + 1  # whole lines only
+        if complete == 0:
+            return False
+        df = normalize_columns(pd.read_csv(io.BytesIO(mark.header + new[:complete])))
+        missing = [c for c in old.snp_cols if c not in df.columns]
+        if missing:
+            raise ValueError(f"appended rows missing SNP columns {missing[:5]}")
+        part = CohortStore.from_frame(df, old.id_col if old.id_col in df.columns else None,
+                                      old.snp_cols, id_offset=len(old.store))
+        store = CohortStore.concat([old.store, part])  # raises on duplicate IDs
+        store.source = FileMark(self.csv_path, mark.offset + complete, st)
+        return self._publish(store, "append", base=old.store)
+
+    def _reload_full(self) -> bool:
+        store = load_cohort(self.csv_path, self.cohort_cache_dir, chunksize=self.chunksize)
+        if store.source.mtime_ns is None:
+            return False  # still being written; pick it up next poll
+        return self._publish(store, "full")
+
+    def _publish(self, store: CohortStore, kind: str, base: Optional[CohortStore] = None) -> bool:
+        # If the model changed while we were building (a config update on
+        # the serving engine), rebuild from the new current one; the store
+        # itself is reused, so retries are cheap. An append only applies to
+        # the cohort it was read against: if that was replaced meanwhile,
+        # the next poll starts over from the new one.
+        while True:
+            old = self.holder.current
+            if base is not None and old.store is not base:
+                return False
+            version = old.model_version
+            warm = old.cache.get_all(version) is not None
+            # appended onto old's cohort: its scored prefix carries over
+            new = old.with_store(store, reuse_rows=len(base) if base is not None else 0)
+            if warm:
+                new.score_all()
+            if self.holder.swap_if(old, version, new):
+                break
+        print(f"[cohort-watcher] {kind} reload: {len(old.store)} -> {len(store)} embryos")
+        return True
+
+
+def watch_interval() -> float:
+    """CSV_WATCH_INTERVAL seconds from the environment (0 disables)."""
+    try:
+        return max(0.0, float(os.getenv("CSV_WATCH_INTERVAL", "2")))
+    except ValueError:
+        return 0.0
+
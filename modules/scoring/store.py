@@ -0,0 +1,351 @@
+# modules/scoring/store.py
+import json
+import os
+import sys
+import uuid
+from itertools import repeat
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+MONOGENIC_GENES = ("BRCA1", "CFTR")
+STORE_FORMAT_VERSION = 1
+ID_CANDIDATES = ["embryo_id", "embryoid", "id", "embryo"]
+
+# Dosage layout: "auto" stores a cohort as CSR when at most
+# SPARSE_MAX_DENSITY of its dosages are non-zero (and it is big enough to
+# matter); "dense" / "sparse" force one or the other.
+DOSAGE_LAYOUT = os.getenv("DOSAGE_LAYOUT", "auto").lower()
+SPARSE_MAX_DENSITY = float(os.getenv("SPARSE_MAX_DENSITY", "0.1"))
+SPARSE_MIN_CELLS = 1 << 20
+
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize column names in place (strip, lowercase, underscores)."""
+    df.columns = [str(c).strip() for c in df.columns]
+    norm_map = {c: c.lower().replace(" ", "_") for c in df.columns}
+    df.rename(columns=norm_map, inplace=True)
+    return df
+
+
+def detect_columns(df: pd.DataFrame) -> Tuple[Optional[str], List[str]]:
+    """Pick the ID column (None if absent) and the SNP feature columns."""
+    id_col = next((c for c in ID_CANDIDATES if c in df.columns), None)
+    snp_cols = [c for c in df.columns if c.startswith("snp")]
+    if not snp_cols:
+        blacklist = {id_col, "brca1", "cftr"}
+        snp_cols = [c for c in df.columns
+                    if c not in blacklist and pd.api.types.is_numeric_dtype(df[c])]
+    return id_col, snp_cols
+
+
+def compact_dosages(values: np.ndarray) -> np.ndarray:
+    """Downcast dosages to int8 when they are whole numbers (0/1/2); else float64."""
+    values = np.asarray(values)
+    if values.dtype.kind in "iub" or values.size == 0:
+        if values.size == 0 or (values.min() >= -128 and values.max() <= 127):
+            return values.astype(np.int8)
+    as_float = values.astype(np.float64)
+    if (np.all(np.isfinite(as_float)) and np.all(as_float == np.round(as_float))
+            and as_float.min() >= -128 and as_float.max() <= 127):
+        return as_float.astype(np.int8)
+    return as_float
+
+
+def scipy_sparse():
+    """scipy.sparse (optional, and slow to import), or None if scipy isn't installed."""
+    try:
+        from scipy import sparse
+    except ImportError:  # pragma: no cover
+        return None
+    return sparse
+
+
+def is_sparse(dosages) -> bool:
+    # only imported once some cohort needed it, so dense-only runs never pay for it
+    sparse = sys.modules.get("scipy.sparse")
+    return sparse is not None and sparse.issparse(dosages)
+
+
+def use_sparse(nnz: int, cells: int) -> bool:
+    """Whether a dosage matrix with `nnz` non-zeros out of `cells` should be CSR."""
+    if DOSAGE_LAYOUT == "dense":
+        return False
+    if DOSAGE_LAYOUT != "sparse":
+        if cells < SPARSE_MIN_CELLS or nnz > SPARSE_MAX_DENSITY * cells:
+            return False
+    return scipy_sparse() is not None
+
+
+def to_layout(dosages, want_sparse: bool):
+    """`dosages` as CSR (sorted indices) or as a dense ndarray."""
+    if want_sparse:
+        csr = dosages.tocsr() if is_sparse(dosages) else scipy_sparse().csr_matrix(dosages)
+        csr.sort_indices()
+        return csr
+    return dosages.toarray() if is_sparse(dosages) else dosages
+
+
+def _nnz(dosages) -> int:
+    return dosages.nnz if is_sparse(dosages) else int(np.count_nonzero(dosages))
+
+
+def iter_csv_chunks(path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """Stream a cohort CSV as normalized DataFrame chunks."""
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        yield normalize_columns(chunk)
+
+
+class CohortStore:
+    """
+    Array-backed view of the cohort used by the scoring engine.
+
+    Rows live in three aligned pieces:
+      - ids: embryo IDs as strings
+      - dosages: (embryos × SNPs) matrix, int8 for 0/1/2 panels, columns in snp_cols order;
+        a scipy CSR matrix instead of an ndarray when the panel is mostly 0 (see use_sparse)
+      - monogenic: {gene: pandas Categorical of status strings}
+    plus an ID → row-position dict so single-embryo lookups are O(1).
+    content_id names the rows' content: the source CSV's sha256 when the
+    loader knows it, otherwise an id unique to this store. source is the
+    cohort_cache.FileMark of the CSV bytes it was loaded from, if any.
+
+    A store can be written to a directory of .npy files (to_dir) and opened
+    again memory-mapped (from_dir), in which case the index is built lazily
+    on the first lookup.
+    """
+
+    def __init__(self, ids: Sequence[str], dosages: np.ndarray,
+                 monogenic: Dict[str, pd.Categorical], snp_cols: List[str],
+                 id_col: str = "embryo_id", build_index: bool = True):
+        if isinstance(ids, np.ndarray) and ids.dtype.kind == "U":
+            self.ids = ids  # already strings (e.g. memory-mapped)
+        else:
+            self.ids = np.asarray([str(i) for i in ids], dtype=object)
+        self.sparse = is_sparse(dosages)
+        if self.sparse or isinstance(dosages, np.memmap):
+            self.dosages = dosages
+        else:
+            self.dosages = np.ascontiguousarray(dosages)
+        self.monogenic = monogenic
+        self.snp_cols = list(snp_cols)
+        self.id_col = id_col
+        self._index = self._build_index(self.ids) if build_index else None
+        self._carriers: Dict[str, np.ndarray] = {}
+        self._mono_rows: Optional[List[dict]] = None
+        self._density: Optional[float] = None
+        self.content_id = uuid.uuid4().hex
+        self.source = None
+
+    @property
+    def index(self) -> Dict[str, int]:
+        if self._index is None:
+            self._index = self._build_index(self.ids)
+        return self._index
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, id_col: Optional[str], snp_cols: List[str],
+                   id_offset: int = 0) -> "CohortStore":
+        if id_col is None or id_col not in df.columns:
+            ids = [f"E{id_offset + i + 1}" for i in range(len(df))]
+            id_col = id_col or "embryo_id"
+        else:
+            ids = df[id_col].tolist()
+        dosages = compact_dosages(df[snp_cols].to_numpy())
+        dosages = to_layout(dosages, use_sparse(_nnz(dosages), dosages.size))
+        monogenic = {}
+        for gene in MONOGENIC_GENES:
+            col = gene.lower()
+            if col in df.columns:
+                monogenic[gene] = pd.Categorical(df[col].astype(str))
+            else:
+                # treat missing columns as 'negative'
+                monogenic[gene] = pd.Categorical(["negative"] * len(df))
+        return cls(ids, dosages, monogenic, snp_cols, id_col=id_col)
+
+    @classmethod
+    def from_csv(cls, path: str, chunksize: Optional[int] = None) -> "CohortStore":
+        """
+        Load a cohort CSV. With `chunksize`, the file is streamed and each chunk
+        is compacted before the next one is parsed, so the object-typed frame
+        for the whole cohort never exists at once.
+        """
+        if not chunksize:
+            df = normalize_columns(pd.read_csv(path))
+            id_col, snp_cols = detect_columns(df)
+            return cls.from_frame(df, id_col, snp_cols)
+
+        parts, id_col, snp_cols, n = [], None, None, 0
+        for chunk in iter_csv_chunks(path, chunksize):
+            if snp_cols is None:
+                id_col, snp_cols = detect_columns(chunk)
+            parts.append(cls.from_frame(chunk, id_col, snp_cols, id_offset=n))
+            n += len(chunk)
+        if not parts:
+            df = normalize_columns(pd.read_csv(path, nrows=0))
+            id_col, snp_cols = detect_columns(df)
+            return cls.from_frame(df, id_col, snp_cols)
+        return cls.concat(parts)
+
+    @classmethod
+    def concat(cls, parts: Sequence["CohortStore"]) -> "CohortStore":
+        first = parts[0]
+        if len(parts) == 1:
+            return first
+        # layout is decided on the whole cohort, not per chunk
+        nnz = sum(_nnz(p.dosages) for p in parts)
+        cells = sum(len(p) for p in parts) * len(first.snp_cols)
+        if use_sparse(nnz, cells):
+            dosages = scipy_sparse().vstack([to_layout(p.dosages, True) for p in parts], format="csr")
+        else:
+            dosages = np.concatenate([to_layout(p.dosages, False) for p in parts])
+        monogenic = {
+            g: pd.api.types.union_categoricals([p.monogenic[g] for p in parts])
+            for g in first.monogenic
+        }
+        ids = np.concatenate([p.ids for p in parts])
+        return cls(ids, dosages, monogenic, first.snp_cols, id_col=first.id_col)
+
+    @staticmethod
+    def _build_index(ids: np.ndarray) -> Dict[str, int]:
+        index = {eid: pos for pos, eid in enumerate(ids.tolist())}
+        if len(index) != len(ids):
+            seen, dupes = set(), []
+            for eid in ids.tolist():
+                if eid in seen and eid not in dupes:
+                    dupes.append(eid)
+                seen.add(eid)
+            shown = ", ".join(dupes[:5]) + (" ..." if len(dupes) > 5 else "")
+            raise ValueError(f"duplicate embryo IDs in cohort: {shown}")
+        return index
+
+    # ---------- Binary (memory-mappable) form ----------
+    def to_dir(self, path: str, meta: Optional[dict] = None) -> None:
+        """
+        Write the store as plain .npy files plus meta.json:
+          dosages.npy (or dosages_{data,indices,indptr}.npy for CSR),
+          ids.npy (fixed-width unicode), mono_<gene>.npy (category codes)
+        """
+        os.makedirs(path, exist_ok=True)
+        if self.sparse:
+            for part in ("data", "indices", "indptr"):
+                np.save(os.path.join(path, f"dosages_{part}.npy"), getattr(self.dosages, part))
+        else:
+            np.save(os.path.join(path, "dosages.npy"), np.ascontiguousarray(self.dosages))
+        ids = self.ids.astype(str) if len(self.ids) else np.array([], dtype="<U1")
+        np.save(os.path.join(path, "ids.npy"), ids)
+        categories = {}
+        for gene, status in self.monogenic.items():
+            np.save(os.path.join(path, f"mono_{gene.lower()}.npy"), np.asarray(status.codes))
+            categories[gene] = [str(c) for c in status.categories]
+        header = {
+            "format_version": STORE_FORMAT_VERSION,
+            "id_col": self.id_col,
+            "snp_cols": self.snp_cols,
+            "rows": len(self),
+            "dosage_layout": "csr" if self.sparse else "dense",
+            "monogenic": categories,
+            **(meta or {}),
+        }
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(header, f)
+
+    @classmethod
+    def from_dir(cls, path: str, mmap: bool = True) -> "CohortStore":
+        """Open a store written by to_dir; arrays are memory-mapped read-only."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format_version") != STORE_FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported store format {meta.get('format_version')}")
+        mode = "r" if mmap else None
+        if meta.get("dosage_layout", "dense") == "csr":
+            sparse = scipy_sparse()
+            if sparse is None:
+                raise ValueError(f"{path}: sparse store needs scipy")
+            data, indices, indptr = (np.load(os.path.join(path, f"dosages_{part}.npy"), mmap_mode=mode)
+                                     for part in ("data", "indices", "indptr"))
+            dosages = sparse.csr_matrix((data, indices, indptr), copy=False,
+                                        shape=(meta["rows"], len(meta["snp_cols"])))
+        else:
+            dosages = np.load(os.path.join(path, "dosages.npy"), mmap_mode=mode)
+        ids = np.load(os.path.join(path, "ids.npy"), mmap_mode=mode)
+        monogenic = {
+            gene: pd.Categorical.from_codes(
+                np.load(os.path.join(path, f"mono_{gene.lower()}.npy")), categories=cats)
+            for gene, cats in meta["monogenic"].items()
+        }
+        # IDs were checked for duplicates when the store was first built
+        return cls(ids, dosages, monogenic, meta["snp_cols"],
+                   id_col=meta["id_col"], build_index=False)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def position(self, embryo_id: str) -> int:
+        """Row position for an embryo ID; raises KeyError if unknown."""
+        return self.index[str(embryo_id)]
+
+    @property
+    def dosage_nbytes(self) -> int:
+        d = self.dosages
+        if self.sparse:
+            return d.data.nbytes + d.indices.nbytes + d.indptr.nbytes
+        return d.nbytes
+
+    @property
+    def density(self) -> float:
+        """Fraction of non-zero dosages (computed once)."""
+        if self._density is None:
+            cells = len(self) * len(self.snp_cols)
+            self._density = _nnz(self.dosages) / cells if cells else 0.0
+        return self._density
+
+    def block(self, start: int, rows: int):
+        """
+        Dosage rows [start, start + rows) as float64 for scoring: an ndarray,
+        or a CSR slice for sparse stores (`block @ W` is a sparse-dense
+        product, so its cost scales with the non-zeros).
+        """
+        return self.dosages[start:start + rows].astype(np.float64, copy=False)
+
+    def carriers(self, gene: str, rows: slice) -> np.ndarray:
+        """Boolean carrier mask for `gene` over `rows` (whole-cohort mask is cached)."""
+        mask = self._carriers.get(gene)
+        if mask is None:
+            status = self.monogenic[gene]
+            is_carrier = np.array([str(c).lower() == "carrier" for c in status.categories], dtype=bool)
+            mask = is_carrier[status.codes] if len(is_carrier) else np.zeros(len(status), dtype=bool)
+            self._carriers[gene] = mask
+        return mask[rows]
+
+    def statuses(self, gene: str, rows: slice) -> List[str]:
+        """Status strings for `gene` over `rows` as a plain list."""
+        status = self.monogenic[gene]
+        cats = np.asarray([str(c) for c in status.categories], dtype=object)
+        return cats[status.codes[rows]].tolist()
+
+    def monogenic_rows(self, rows: slice) -> List[dict]:
+        """
+        {gene: status} per row over `rows`. Built once for the whole store;
+        the dicts are shared by every result that uses them (read-only).
+        """
+        if self._mono_rows is None:
+            genes = list(self.monogenic)
+            if genes:
+                cols = [self.statuses(g, slice(None)) for g in genes]
+                self._mono_rows = list(map(dict, map(zip, repeat(genes), zip(*cols))))
+            else:
+                self._mono_rows = [{} for _ in range(len(self))]
+        return self._mono_rows[rows]
+
+    def to_frame(self) -> pd.DataFrame:
+        """Compact DataFrame view (int8 dosages, categorical statuses)."""
+        if self.sparse:
+            df = pd.DataFrame.sparse.from_spmatrix(self.dosages, columns=self.snp_cols)
+        else:
+            df = pd.DataFrame(self.dosages, columns=self.snp_cols)
+        df.insert(0, self.id_col, self.ids)
+        for gene, status in self.monogenic.items():
+            df[gene.lower()] = status
+        return df
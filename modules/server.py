@@ -0,0 +1,132 @@
+# modules/server.py
+"""
+Pre-fork production server for app.py (gunicorn).
+
+The master imports the app once, builds the engine and warms it (cohort
+logits, scored cohort, ranking index, clinic DB, the lazily imported
+report/ranking modules), then freezes the heap with gc.freeze() and forks
+the workers. Workers share all of that copy-on-write instead of each
+re-parsing the CSV and regenerating weights, and a recycled worker
+(max_requests) comes back warm.
+
+Signals to the master:
+  HUP   rebuild and re-warm the engine from the CSV and the saved model
+        (data/weights.bin), then replace the workers gracefully
+  TERM  graceful shutdown (in-flight requests finish)
+  TTIN / TTOU  one more / one fewer worker
+
+Model changes made through the API (POST /api/config, a "reweight" job
+via POST /api/jobs, POST /api/model/load) only apply to the worker that
+served them: save the model (POST /api/model/save) and HUP the master to
+roll it out to every worker.
+"""
+import gc
+import importlib
+import os
+import time
+from typing import Optional
+
+try:  # optional: only needed for `cli.py serve`
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # pragma: no cover
+    BaseApplication = object
+
+# imported by app.py on first use; loading them in the master shares them
+PRELOAD_MODULES = (
+    "modules.scoring.ranking",
+    "modules.scoring.genotypes",
+    "modules.scoring.io",
+    "modules.reports.batch",
+)
+
+
+def warm(webapp, score_workers: Optional[int] = None) -> None:
+    """Precompute what requests would otherwise build lazily on first use."""
+    t0 = time.perf_counter()
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+    webapp.init_db()
+    engine = webapp.engines.current
+    engine.score_all(workers=score_workers)
+    engine.ranking().query()  # default (overall score) order
+    print(f"[serve] warmed {len(engine.store)} embryos (model v{engine.model_version}) "
+          f"in {time.perf_counter() - t0:.2f}s")
+
+
+def _pre_fork(server, worker):
+    import app as webapp
+    webapp.before_fork()
+
+
+def _post_fork(server, worker):
+    # threads (the CSV watcher) don't survive fork; start them per worker
+    import app as webapp
+    webapp.start_background()
+
+
+class PreforkServer(BaseApplication):
+    """gunicorn application serving app.app, loaded and warmed in the master."""
+
+    def __init__(self, options: dict, score_workers: Optional[int] = None):
+        if BaseApplication is object:
+            raise RuntimeError("gunicorn is not installed (pip install gunicorn)")
+        self.options = options
+        self.score_workers = score_workers
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if value is not None and key in self.cfg.settings:
+                self.cfg.set(key, value)
+        self.cfg.set("pre_fork", _pre_fork)
+        self.cfg.set("post_fork", _post_fork)
+
+    def load(self):
+        import app as webapp
+        if self.cfg.preload_app:
+            warm(webapp, self.score_workers)
+            self._freeze()
+        return webapp.app
+
+    def reload(self):
+        super().reload()
+        if self.cfg.preload_app and self.callable is not None:
+            import app as webapp
+            gc.unfreeze()  # let the old engine be collected
+            webapp.engines.swap(webapp.build_engine())
+            warm(webapp, self.score_workers)
+            self._freeze()
+
+    @staticmethod
+    def _freeze():
+        # Move everything allocated so far out of the collector's reach: a
+        # collection in a worker would otherwise touch (and so copy) every
+        # page holding a tracked object from the master.
+        gc.collect()
+        gc.freeze()
+
+
+def serve(bind: str, workers: int, threads: int = 1, max_requests: int = 0,
+          max_requests_jitter: int = 0, timeout: int = 60, graceful_timeout: int = 30,
+          reload: bool = False, score_workers: Optional[int] = None) -> int:
+    """
+    Run the app under gunicorn until shut down. `reload` restarts workers
+    on code changes (development); it turns off preloading, so each worker
+    then builds its own engine.
+    """
+    os.environ["PREFORK"] = "1"  # app.py: leave background threads to post_fork
+    options = {
+        "bind": bind,
+        "workers": workers,
+        "threads": threads,
+        "worker_class": "gthread" if threads > 1 else "sync",
+        "max_requests": max_requests,
+        "max_requests_jitter": max_requests_jitter,
+        "timeout": timeout,
+        "graceful_timeout": graceful_timeout,
+        "preload_app": not reload,
+        "reload": reload,
+        "accesslog": "-",
+    }
+    PreforkServer(options, score_workers=score_workers).run()
+    return 0
@@ -0,0 +1,308 @@
+# scripts/benchmark.py
+"""
+Reproducible benchmarks for the scoring engine, model IO, PDF reports,
+the clinic DB, the Flask routes and app cold start.
+
+  python scripts/benchmark.py --embryos 20000 --snps 1000 --conditions 3 --out bench.json
+  python scripts/benchmark.py --quick
+  python scripts/benchmark.py --baseline bench.json     # print p50 change per stage
+
+A seeded synthetic cohort is generated in a temp dir, each stage is timed
+`--repeat` times, and one JSON document is written with, per stage: call
+count, throughput (calls/s and embryos/s where it applies), p50/p99/mean
+latency in ms, and peak traced memory in MiB (measured on one extra call
+under tracemalloc so tracing doesn't skew the timings).
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def make_cohort(path: str, embryos: int, snps: int, seed: int = 0) -> None:
+    """Synthetic cohort CSV: id, snp1..snpN (0/1/2 dosages), BRCA1, CFTR."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.integers(0, 3, size=(embryos, snps), dtype=np.int8),
+                      columns=[f"snp{i + 1}" for i in range(snps)])
+    df.insert(0, "id", [f"E{i}" for i in range(embryos)])
+    df["BRCA1"] = rng.choice(["negative", "carrier"], embryos, p=[0.9, 0.1])
+    df["CFTR"] = rng.choice(["negative", "carrier"], embryos, p=[0.95, 0.05])
+    df.to_csv(path, index=False)
+
+
+def set_conditions(engine, conditions: int, seed: int = 0) -> None:
+    """Swap in `conditions` random weight columns (the engine ships with 3)."""
+    if conditions == len(engine.condition_names):
+        return
+    rng = np.random.default_rng(seed)
+    W = rng.normal(size=(len(engine.snp_cols), conditions))
+    engine.set_weight_matrix(W, snp_cols=engine.snp_cols,
+                             conditions=[f"Condition{i + 1}" for i in range(conditions)])
+
+
+def _pct(sorted_xs, q: float) -> float:
+    # nearest-rank percentile
+    k = max(0, min(len(sorted_xs) - 1, int(np.ceil(q / 100 * len(sorted_xs))) - 1))
+    return sorted_xs[k]
+
+
+class Bench:
+    def __init__(self, repeat: int, trace_memory: bool = True):
+        self.repeat = repeat
+        self.trace_memory = trace_memory
+        self.results = {}
+
+    def run(self, name: str, fn, setup=None, repeat: int = None, items: int = None) -> None:
+        """
+        Time fn() `repeat` times (setup(), if given, runs untimed before each
+        call). `items` is the number of embryos one call processes.
+        """
+        repeat = repeat or self.repeat
+        times = []
+        for _ in range(repeat):
+            if setup:
+                setup()
+            gc.collect()
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+
+        peak = None
+        if self.trace_memory:
+            if setup:
+                setup()
+            gc.collect()
+            tracemalloc.start()
+            fn()
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+
+        times.sort()
+        total = sum(times)
+        res = {
+            "calls": repeat,
+            "p50_ms": round(_pct(times, 50) * 1e3, 3),
+            "p99_ms": round(_pct(times, 99) * 1e3, 3),
+            "mean_ms": round(total / repeat * 1e3, 3),
+            "calls_per_s": round(repeat / total, 2) if total else None,
+            "peak_mib": None if peak is None else round(peak, 2),
+        }
+        if items:
+            res["embryos_per_s"] = round(items * repeat / total, 1) if total else None
+        self.results[name] = res
+        print(f"[bench] {name:<24} p50 {res['p50_ms']:>10.3f} ms  p99 {res['p99_ms']:>10.3f} ms"
+              + (f"  peak {peak:8.2f} MiB" if peak is not None else ""), file=sys.stderr)
+
+
+def bench_engine(b: Bench, csv_path: str, tmp: str, args) -> "ScoringEngine":
+    from modules.scoring.pipeline import ScoringEngine
+    from modules.scoring.io import save_engine_state, load_engine_state
+    n = args.embryos
+
+    b.run("engine_init", lambda: ScoringEngine(csv_path), repeat=args.init_repeat, items=n)
+    cache_dir = os.path.join(tmp, "cohort_cache")
+    ScoringEngine(csv_path, cohort_cache_dir=cache_dir)  # build the binary cache once
+    b.run("engine_init_cached", lambda: ScoringEngine(csv_path, cohort_cache_dir=cache_dir),
+          repeat=args.init_repeat, items=n)
+
+    engine = ScoringEngine(csv_path)
+    set_conditions(engine, args.conditions)
+    rng = np.random.default_rng(1)
+    ids = [str(engine.store.ids[i]) for i in rng.integers(0, n, size=256)]
+    it = iter(ids * (1 + args.repeat * 4 // len(ids)))
+
+    b.run("detail_cold", lambda: engine.compute_detailed_scores(next(it)),
+          setup=engine.invalidate, items=1)
+    b.run("score_all_cold", engine.score_all, setup=engine.invalidate, items=n)
+    b.run("score_all_warm", engine.score_all, items=n)
+    b.run("detail_warm", lambda: engine.compute_detailed_scores(next(it)), items=1)
+    if args.workers > 1:
+        b.run(f"score_all_{args.workers}_workers", lambda: engine.score_all(workers=args.workers),
+              setup=engine.invalidate, items=n)
+
+    scales = iter(np.linspace(0.5, 2.0, args.repeat + 1))
+    b.run("update_config_scale", lambda: (engine.update_config(scale=float(next(scales))),
+                                          engine.score_all()), items=n)
+    seeds = iter(range(1000, 1000 + args.repeat + 1))
+    b.run("update_config_seed", lambda: (engine.update_config(seed=next(seeds)),
+                                         engine.score_all()), items=n)
+
+    state = os.path.join(tmp, "weights.bin")
+    b.run("save_engine_state", lambda: save_engine_state(engine, state))
+    b.run("load_engine_state", lambda: load_engine_state(state))
+    b.run("load_engine_state_copy", lambda: load_engine_state(state, mmap=False))
+    b.run("ranking_top20", lambda: engine.ranking().query(limit=20))
+    return engine
+
+
+def bench_reports(b: Bench, engine, tmp: str) -> None:
+    from modules.reports.pdf import generate_report_pdf, get_report_pdf
+    eid = str(engine.store.ids[0])
+    detail = engine.compute_detailed_scores(eid)
+    out = os.path.join(tmp, "reports")
+    b.run("generate_report_pdf", lambda: generate_report_pdf(out, eid, detail))
+    b.run("get_report_pdf_cached", lambda: get_report_pdf(out, eid, detail, engine.model_version))
+
+
+def bench_db(b: Bench, engine, tmp: str) -> None:
+    from modules.db.clinic import ClinicDB
+    db = ClinicDB(os.path.join(tmp, "bench.db"))
+    db.init()
+    ids = [str(i) for i in engine.store.ids[:200]]
+    for i in range(2000):
+        db.add_note(ids[i % len(ids)], f"note {i}", f"2024-01-01T00:{i % 60:02d}:00")
+    notes = iter(range(10 ** 9))
+    b.run("db_add_note", lambda: db.add_note(ids[0], f"bench {next(notes)}"))
+    b.run("db_fetch_activity", lambda: db.fetch_activity(ids[1]))
+    db.close()
+
+
+def bench_routes(b: Bench, engine) -> None:
+    os.environ.setdefault("CSV_WATCH_INTERVAL", "0")
+    import app as webapp
+    # point the app at the benchmark engine (its paths are in tmp, see main)
+    webapp.engines.swap(engine)
+    client = webapp.app.test_client()
+    H = {"Authorization": f"Bearer {webapp.API_TOKEN}"}
+    eid = str(engine.store.ids[0])
+    n = len(engine.store)
+
+    def get(url, headers=H):
+        def call():
+            r = client.get(url, headers=headers)
+            assert r.status_code == 200, (url, r.status_code)
+            r.get_data()
+        return call
+
+    b.run("route_api_list", get("/api/embryos"), setup=webapp._ENCODED.clear, items=n)
+    b.run("route_api_list_columnar", get("/api/embryos?format=columnar"),
+          setup=webapp._ENCODED.clear, items=n)
+    b.run("route_api_list_cached", get("/api/embryos"), items=n)
+    b.run("route_api_top20", get("/api/embryos?top=20"), setup=webapp._ENCODED.clear)
+    b.run("route_api_detail", get(f"/api/embryos/{eid}"))
+    b.run("route_api_export", get("/api/embryos/export"), items=n)
+    b.run("route_dashboard", get("/?top=50"))
+    b.run("route_embryo_page", get(f"/embryos/{eid}"))
+    b.run("route_report_pdf", get(f"/report/{eid}.pdf"))
+
+
+def bench_startup(b: Bench, args) -> None:
+    """
+    Cold start in a fresh interpreter (interpreter startup included):
+    `import app`, then import plus the first request, which is where the
+    lazily built engine, DB and imports land. See `cli.py importtime`.
+    """
+    import subprocess
+    env = dict(os.environ, CSV_WATCH_INTERVAL="0")
+
+    def run(code):
+        def call():
+            subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, env=env, check=True)
+        return call
+
+    b.run("startup_import_app", run("import app"), repeat=args.init_repeat)
+    b.run("startup_first_request",
+          run("import app; assert app.app.test_client().get('/').status_code == 200"),
+          repeat=args.init_repeat)
+
+
+def compare(results: dict, baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        base = json.load(f)["stages"]
+    print("[bench] p50 vs baseline:", file=sys.stderr)
+    for name, res in results.items():
+        if name in base and base[name]["p50_ms"]:
+            change = (res["p50_ms"] - base[name]["p50_ms"]) / base[name]["p50_ms"] * 100
+            print(f"[bench]   {name:<24} {base[name]['p50_ms']:>10.3f} -> {res['p50_ms']:>10.3f} ms "
+                  f"({change:+.1f}%)", file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--embryos", type=int, default=10000)
+    p.add_argument("--snps", type=int, default=500)
+    p.add_argument("--conditions", type=int, default=3)
+    p.add_argument("--repeat", type=int, default=20, help="timed calls per stage")
+    p.add_argument("--init-repeat", type=int, default=3, help="timed calls for engine construction")
+    p.add_argument("--workers", type=int, default=1, help="also time parallel score_all if > 1")
+    p.add_argument("--skip", default="",
+                   help="comma list of groups to skip: engine,reports,db,routes,startup")
+    p.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    p.add_argument("--quick", action="store_true", help="small cohort, few repeats")
+    p.add_argument("--baseline", help="earlier JSON output to compare p50s against")
+    p.add_argument("--out", default="-", help="JSON output file ('-' for stdout)")
+    args = p.parse_args(argv)
+    if args.quick:
+        args.embryos, args.snps, args.repeat, args.init_repeat = 2000, 100, 5, 2
+    skip = {s for s in args.skip.split(",") if s}
+
+    b = Bench(args.repeat, trace_memory=not args.no_memory)
+    with tempfile.TemporaryDirectory(prefix="embryo-bench-") as tmp:
+        # app.py (in-process routes and the startup subprocesses) keeps its DB,
+        # cohort cache, saved model and reports in tmp: nothing in data/ is
+        # read back or written, so every run starts from the same state
+        os.environ.update({
+            "DATA_DIR": os.path.join(tmp, "app_data"),
+            "REPORTS_DIR": os.path.join(tmp, "route_reports"),
+            "CSV_PATH": os.path.join(BASE_DIR, "data", "embryos.csv"),
+        })
+        csv_path = os.path.join(tmp, "cohort.csv")
+        t0 = time.perf_counter()
+        make_cohort(csv_path, args.embryos, args.snps)
+        print(f"[bench] cohort {args.embryos} x {args.snps} x {args.conditions} "
+              f"generated in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+
+        from modules.scoring.pipeline import ScoringEngine
+        if "engine" in skip:
+            engine = ScoringEngine(csv_path)
+            set_conditions(engine, args.conditions)
+        else:
+            engine = bench_engine(b, csv_path, tmp, args)
+        if "reports" not in skip:
+            bench_reports(b, engine, tmp)
+        if "db" not in skip:
+            bench_db(b, engine, tmp)
+        if "routes" not in skip:
+            bench_routes(b, engine)
+        if "startup" not in skip:
+            bench_startup(b, args)
+
+    try:
+        import resource
+        max_rss_mib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:  # pragma: no cover - windows
+        max_rss_mib = None
+    doc = {
+        "params": {k: getattr(args, k) for k in ("embryos", "snps", "conditions", "repeat", "workers")},
+        "env": {
+            "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count(),
+        },
+        "max_rss_mib": None if max_rss_mib is None else round(max_rss_mib, 1),
+        "stages": b.results,
+    }
+    out = open(args.out, "w") if args.out != "-" else sys.stdout
+    try:
+        json.dump(doc, out, indent=2)
+        out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if args.baseline:
+        compare(b.results, args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
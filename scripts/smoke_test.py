@@ -1,51 +1,256 @@
-import os, requests, json
+"""
+Smoke test for the demo.
+
+  python scripts/smoke_test.py                  # engine checks + a running server
+  python scripts/smoke_test.py --no-server      # engine checks only
+  python scripts/smoke_test.py --base http://127.0.0.1:8000
+
+The engine checks run in-process on a synthetic cohort in a temp dir:
+block-aligned scores are identical across the detail, streaming, parallel,
+CSR and cached-cohort paths, and the cohort watcher picks up CSV appends
+but keeps the old engine when an append brings a duplicate ID. The server
+checks hit the API: list/detail/auth/PDF, ETag and cursor paging,
+POST /api/score validation, and config/model save/load. Point it at a
+single-process server (python app.py, or cli.py serve --workers 1): a
+config change only reaches the worker that served it.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+import requests
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
 
 BASE = "http://127.0.0.1:8000"
 TOK = os.environ.get("API_TOKEN", "demo123")
 H = {"Authorization": f"Bearer {TOK}"}
+CSV_PATH = os.environ.get("CSV_PATH") or os.path.join(
+    os.environ.get("DATA_DIR") or os.path.join(BASE_DIR, "data"), "embryos.csv")
 
 def ping(method, url, **kw):
     r = requests.request(method, url, **kw)
     print(f"{method} {url} -> {r.status_code}")
     return r
 
-# 1) List embryos
-r = ping("GET", f"{BASE}/api/embryos", headers=H, timeout=5)
-r.raise_for_status()
-embryos = r.json()
-assert isinstance(embryos, list) and embryos, "no embryos returned"
-print("✓ /api/embryos returned", len(embryos), "embryos")
-
-# 2) Detail for first embryo
-eid = embryos[0]["embryo_id"]
-r = ping("GET", f"{BASE}/api/embryos/{eid}", headers=H, timeout=5)
-r.raise_for_status()
-detail = r.json()
-assert {"embryo_id","polygenic","monogenic","overall_score"} <= detail.keys()
-print(f"✓ detail OK for embryo {eid}: overall={detail['overall_score']}")
-
-# 3) Unauthorized should be 401
-r = ping("GET", f"{BASE}/api/embryos", timeout=5)
-assert r.status_code == 401, "expected 401 without token"
-print("✓ unauthorized request correctly blocked (401)")
-
-# 4) PDF endpoint
-r = ping("GET", f"{BASE}/report/{eid}.pdf", timeout=20)
-r.raise_for_status()
-ct = (r.headers.get("content-type") or "").lower()
-assert ct.startswith("application/pdf"), f"unexpected content-type: {ct}"
-open(f"_tmp_report_{eid}.pdf","wb").write(r.content)
-print(f"✓ PDF downloaded to _tmp_report_{eid}.pdf")
-
-print("\nALL SMOKE TESTS PASSED ✅")
-
-
-def ok(r): 
-    assert r.status_code == 200, (r.status_code, r.text); 
+def ok(r):
+    assert r.status_code == 200, (r.status_code, r.text)
     return r.json()
 
-print("[smoke] GET /api/config"); ok(requests.get(f"{BASE}/api/config", headers=H))
-print("[smoke] POST /api/config"); ok(requests.post(f"{BASE}/api/config", headers={**H, "Content-Type":"application/json"}, data=json.dumps({"seed":1234,"scale":1.25})))
-print("[smoke] POST /api/model/save"); ok(requests.post(f"{BASE}/api/model/save", headers=H))
-print("[smoke] POST /api/model/load"); ok(requests.post(f"{BASE}/api/model/load", headers=H))
-print("[smoke] OK ✅")
\ No newline at end of file
+
+# ----------------------------
+# In-process engine checks
+# ----------------------------
+def make_cohort(path, embryos, snps, density=0.05, start=0, seed=0):
+    """Mostly-zero 0/1/2 cohort CSV with ids E<start>.., BRCA1 and CFTR."""
+    rng = np.random.default_rng(seed)
+    X = np.where(rng.random((embryos, snps)) < density, rng.integers(1, 3, (embryos, snps)), 0)
+    df = pd.DataFrame(X, columns=[f"snp{i + 1}" for i in range(snps)])
+    df.insert(0, "id", [f"E{start + i}" for i in range(embryos)])
+    df["BRCA1"] = np.where(rng.random(embryos) < 0.1, "carrier", "negative")
+    df["CFTR"] = np.where(rng.random(embryos) < 0.05, "carrier", "negative")
+    return df
+
+def check_scores(tmp):
+    from modules.scoring import store as cohort_store
+    from modules.scoring.pipeline import SCORE_BLOCK_ROWS, ScoringEngine
+
+    path = os.path.join(tmp, "scores.csv")
+    make_cohort(path, 2 * SCORE_BLOCK_ROWS + 808, 200).to_csv(path, index=False)
+    layout = cohort_store.DOSAGE_LAYOUT
+    try:
+        cohort_store.DOSAGE_LAYOUT = "dense"
+        e = ScoringEngine(path)
+        baseline = e.score_all(workers=1)
+        n = len(baseline)
+
+        e.invalidate()  # no logits memo: details score their own block
+        rows = [0, SCORE_BLOCK_ROWS - 1, SCORE_BLOCK_ROWS, n - 1]
+        assert [e.compute_detailed_scores(baseline[i]["embryo_id"]) for i in rows] == \
+            [baseline[i] for i in rows], "detail scores differ from score_all"
+        print("✓ per-embryo details match score_all")
+
+        assert list(e.iter_scores(source=path, chunksize=5000)) == baseline, "streamed scores differ"
+        print("✓ streaming the CSV matches score_all")
+
+        e.invalidate()
+        assert e.score_all(workers=3) == baseline, "parallel scores differ from serial"
+        print("✓ parallel (3 workers) matches serial")
+
+        cache = os.path.join(tmp, "cohort_cache")
+        ScoringEngine(path, cohort_cache_dir=cache)
+        assert ScoringEngine(path, cohort_cache_dir=cache).score_all() == baseline, \
+            "memory-mapped cohort scores differ"
+        print("✓ memory-mapped cohort cache matches")
+
+        cohort_store.DOSAGE_LAYOUT = "sparse"
+        s = ScoringEngine(path)
+        assert s.store.sparse, "expected a CSR cohort (is scipy installed?)"
+        assert s.score_all() == baseline, "CSR scores differ from dense"
+        s.invalidate()
+        assert s.score_all(workers=3) == baseline, "parallel CSR scores differ from dense"
+        print("✓ CSR (serial and parallel) matches dense")
+    finally:
+        cohort_store.DOSAGE_LAYOUT = layout
+
+def check_reload(tmp):
+    from modules.scoring.pipeline import SCORE_BLOCK_ROWS, ScoringEngine
+    from modules.scoring.reload import CohortWatcher, EngineHolder
+
+    path = os.path.join(tmp, "reload.csv")
+    n = SCORE_BLOCK_ROWS + 904
+    make_cohort(path, n, 50, density=0.3).to_csv(path, index=False)
+    holder = EngineHolder(ScoringEngine(path))
+    watcher = CohortWatcher(holder, path)
+    holder.current.score_all()  # warm: the append reuses the scored prefix
+
+    make_cohort(path, 300, 50, density=0.3, start=n, seed=1).to_csv(path, mode="a", header=False, index=False)
+    assert watcher.check() == "append", "append not picked up"
+    appended = holder.current
+    assert len(appended.store) == n + 300
+    assert appended.score_all() == ScoringEngine(path).score_all(), "appended scores differ from a fresh load"
+    print("✓ CSV append picked up and scored like a fresh load")
+
+    make_cohort(path, 1, 50, density=0.3, seed=2).to_csv(path, mode="a", header=False, index=False)
+    try:
+        watcher.check()
+    except ValueError as e:
+        assert "duplicate" in str(e), e
+    else:
+        raise AssertionError("duplicate-ID append was accepted")
+    assert holder.current is appended, "engine swapped despite duplicate IDs"
+    print("✓ duplicate-ID append rejected, old engine kept")
+
+
+# ----------------------------
+# Server checks
+# ----------------------------
+def check_api(base):
+    # 1) List embryos
+    r = ping("GET", f"{base}/api/embryos", headers=H, timeout=5)
+    r.raise_for_status()
+    embryos = r.json()
+    assert isinstance(embryos, list) and embryos, "no embryos returned"
+    print("✓ /api/embryos returned", len(embryos), "embryos")
+
+    # 2) Detail for first embryo
+    eid = embryos[0]["embryo_id"]
+    r = ping("GET", f"{base}/api/embryos/{eid}", headers=H, timeout=5)
+    r.raise_for_status()
+    detail = r.json()
+    assert {"embryo_id","polygenic","monogenic","overall_score"} <= detail.keys()
+    print(f"✓ detail OK for embryo {eid}: overall={detail['overall_score']}")
+
+    # 3) Unauthorized should be 401
+    r = ping("GET", f"{base}/api/embryos", timeout=5)
+    assert r.status_code == 401, "expected 401 without token"
+    print("✓ unauthorized request correctly blocked (401)")
+
+    # 4) PDF endpoint
+    r = ping("GET", f"{base}/report/{eid}.pdf", timeout=20)
+    r.raise_for_status()
+    ct = (r.headers.get("content-type") or "").lower()
+    assert ct.startswith("application/pdf"), f"unexpected content-type: {ct}"
+    open(f"_tmp_report_{eid}.pdf","wb").write(r.content)
+    print(f"✓ PDF downloaded to _tmp_report_{eid}.pdf")
+
+def check_etag(base):
+    url = f"{base}/api/embryos"
+    r = ping("GET", url, headers=H, timeout=5)
+    etag = r.headers.get("ETag")
+    assert r.status_code == 200 and etag, "list response has no ETag"
+    r = ping("GET", url, headers={**H, "If-None-Match": etag}, timeout=5)
+    assert r.status_code == 304 and not r.content, "expected an empty 304 for a matching ETag"
+    print("✓ If-None-Match with the current ETag gets 304")
+
+    page = ok(ping("GET", url, headers=H, params={"limit": 2}, timeout=5))
+    assert len(page["items"]) == 2 and page["next_cursor"], page
+    r = ping("GET", url, headers=H, params={"limit": 2, "cursor": page["next_cursor"]}, timeout=5)
+    rest = ok(r)
+    assert rest["offset"] == 2 and rest["model_version"] == page["model_version"], rest
+    seen = {i["embryo_id"] for i in page["items"]}
+    assert not seen & {i["embryo_id"] for i in rest["items"]}, "cursor page overlaps the first"
+    r2 = ping("GET", url, headers={**H, "If-None-Match": r.headers["ETag"]},
+              params={"limit": 2, "cursor": page["next_cursor"]}, timeout=5)
+    assert r2.status_code == 304, "expected 304 for an unchanged cursor page"
+    r = ping("GET", url, headers=H, params={"limit": 3, "cursor": page["next_cursor"]}, timeout=5)
+    assert r.status_code == 400, "cursor accepted for a different query"
+    print("✓ cursor pages continue, revalidate with 304 and are tied to their query")
+
+    cfg = ok(requests.get(f"{base}/api/config", headers=H, timeout=5))
+    ok(requests.post(f"{base}/api/config", headers=H, json={"seed": (cfg["seed"] or 0) + 1}, timeout=5))
+    r = ping("GET", url, headers={**H, "If-None-Match": etag}, timeout=5)
+    assert r.status_code == 200 and r.headers.get("ETag") != etag, "ETag survived a config change"
+    print("✓ a config change invalidates the ETag")
+
+def check_score(base):
+    from modules.scoring.store import detect_columns, normalize_columns
+
+    url = f"{base}/api/score"
+    _, snp_cols = detect_columns(normalize_columns(pd.read_csv(CSV_PATH, nrows=1)))
+    n = len(snp_cols)
+
+    def post(data, ctype, **kw):
+        return ping("POST", url, headers={**H, "Content-Type": ctype}, data=data, timeout=10, **kw)
+
+    def rejected(r, *words):
+        assert r.status_code == 400, (r.status_code, r.text)
+        error = r.json()["error"]
+        assert all(w in error for w in words), error
+
+    # the cohort file itself scores exactly like the served cohort
+    cohort = ok(requests.get(f"{base}/api/embryos", headers=H, timeout=5))
+    with open(CSV_PATH, "rb") as f:
+        assert ok(post(f.read(), "text/csv")) == cohort, "/api/score differs from /api/embryos"
+    print("✓ scoring the cohort CSV matches /api/embryos")
+
+    good = {"snp_cols": snp_cols, "dosages": [[0] * n, [2] * n], "ids": ["X1", "X2"]}
+    assert [d["embryo_id"] for d in ok(post(json.dumps(good), "application/json"))] == ["X1", "X2"]
+
+    inf = '{"snp_cols": %s, "dosages": [[%s]]}' % (json.dumps(snp_cols), ", ".join(["Infinity"] + ["0"] * (n - 1)))
+    rejected(post(inf, "application/json"), repr(snp_cols[0]))
+    rejected(post(json.dumps({**good, "dosages": [[0] * (n - 1) + [3]], "ids": ["X1"]}),
+                  "application/json"), repr(snp_cols[-1]))
+    rejected(post(json.dumps({"rows": []}), "application/json"), "no rows")
+    rejected(post(json.dumps({"rows": [{"id": "X1"}]}), "application/json"), "missing")
+    rejected(post(",".join(snp_cols) + "\n" + ",".join(["1"] * (n - 1) + ["x"]) + "\n", "text/csv"),
+             repr(snp_cols[-1]))
+    buf = io.BytesIO()
+    np.save(buf, np.full((1, n), np.nan))
+    rejected(post(buf.getvalue(), "application/x-npy"))
+    rejected(post("snp1\n1\n", "text/plain"), "content type")
+    rejected(post(json.dumps(good), "application/json", params={"format": "xml"}), "format")
+    print("✓ POST /api/score rejects non-finite, out-of-range, empty and malformed batches (400)")
+
+def check_config(base):
+    print("[smoke] GET /api/config"); ok(requests.get(f"{base}/api/config", headers=H))
+    print("[smoke] POST /api/config"); ok(requests.post(f"{base}/api/config", headers={**H, "Content-Type":"application/json"}, data=json.dumps({"seed":1234,"scale":1.25})))
+    print("[smoke] POST /api/model/save"); ok(requests.post(f"{base}/api/model/save", headers=H))
+    print("[smoke] POST /api/model/load"); ok(requests.post(f"{base}/api/model/load", headers=H))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base", default=BASE, help="server URL (default %(default)s)")
+    ap.add_argument("--no-server", action="store_true", help="only run the in-process engine checks")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        check_scores(tmp)
+        check_reload(tmp)
+    if not args.no_server:
+        check_api(args.base)
+        check_etag(args.base)
+        check_score(args.base)
+        check_config(args.base)
+    print("\nALL SMOKE TESTS PASSED ✅")
+
+
+if __name__ == "__main__":  # the scoring pool's forkserver re-imports __main__
+    main()